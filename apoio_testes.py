@@ -0,0 +1,36 @@
+"""
+GerenciadorNotasApp sem janela para os testes e o benchmark.py: o app passa pelo __init__
+de verdade (migrações, critérios, EscritorSQLite/ExecutorTarefas, leitura dos alunos) com
+um tkinter.Tcl() como raiz, que entrega as tarefas em segundo plano sem precisar de tela.
+"""
+import importlib.util
+import os
+import time
+import tkinter
+
+_spec = importlib.util.spec_from_file_location("enote", os.path.join(os.path.dirname(os.path.abspath(__file__)), "enote4.4.py"))
+enote = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(enote)
+
+
+def criar_app(caminho):
+    """ App sobre o banco em caminho (criado ou migrado como ao abrir o ENOTE), com os alunos já carregados. """
+    app = enote.GerenciadorNotasApp(tkinter.Tcl(), caminho, janela=False)
+    esperar_tarefas(app)
+    return app
+
+
+def esperar_tarefas(app, limite=60):
+    """ Roda o laço do Tcl até as tarefas acompanhadas terminarem e seus ao_concluir rodarem. """
+    fim = time.monotonic() + limite
+    while app.verificando_tarefas:
+        if time.monotonic() > fim:
+            raise TimeoutError(f"tarefas em segundo plano não terminaram em {limite} s")
+        app.root.update()
+        time.sleep(0.01)
+
+
+def fechar(app):
+    """ Encerra as threads do app e fecha a conexão da interface. """
+    app.fechar()
+    app.conexao.close()
@@ -0,0 +1,227 @@
+"""
+Medições de desempenho do ENOTE 4.4, sem abrir a janela. Cada medição cria seu próprio
+banco temporário. Ex.:
+    python benchmark.py                      (todas)
+    python benchmark.py escrita --alunos 5000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from apoio_testes import criar_app, enote, fechar
+
+DISCIPLINAS = ["MAT", "POR", "HIS"]
+
+
+def componentes(i, d):
+    """ Quatro componentes determinísticos (em centésimos) para o aluno i na disciplina d. """
+    return [enote.Componente(nome, (i * 37 + d * 101 + k * 53) % (enote.NOTA_MAXIMA + 1))
+            for k, nome in enumerate(enote.COMPONENTES_PADRAO)]
+
+
+def povoar(app, alunos, turmas=30, disciplinas=DISCIPLINAS):
+    """ alunos alunos em turmas turmas, cada um com as disciplinas lançadas (médias gravadas). """
+    ids = [f"A{i:07d}" for i in range(alunos)]
+    app.executar_escrita(lambda cur: [app.gravar_aluno(cur, aluno_id, {"nome": f"Aluno {i}", "turma": f"T{i % turmas:03d}"})
+                                      for i, aluno_id in enumerate(ids)])
+    app.salvar_notas_lote([(aluno_id, disciplina, componentes(i, d))
+                           for i, aluno_id in enumerate(ids) for d, disciplina in enumerate(disciplinas)])
+    return ids
+
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+# ======================================================
+# ESCRITA: UM COMMIT POR LINHA x UMA TRANSAÇÃO POR AÇÃO
+# ======================================================
+def medir_escrita(pasta, alunos):
+    """ Lançar uma disciplina para cada aluno: um commit por aluno contra salvar_notas_lote. """
+    app = criar_app(os.path.join(pasta, "escrita.db"))
+    ids = [f"A{i:07d}" for i in range(alunos)]
+    app.executar_escrita(lambda cur: [app.gravar_aluno(cur, aluno_id, {"nome": aluno_id, "turma": "T1"})
+                                      for aluno_id in ids])
+    lancamentos = [(aluno_id, "MAT", componentes(i, 0)) for i, aluno_id in enumerate(ids)]
+
+    def um_commit_por_aluno():
+        for aluno_id, disciplina, comps in lancamentos:
+            app.executar_escrita(app.gravar_notas, aluno_id, disciplina, comps)
+    _, por_aluno = cronometrar(um_commit_por_aluno)
+    app.cursor.execute("DELETE FROM notas")
+    app.cursor.execute("DELETE FROM componentes")
+    app.conexao.commit()
+    _, em_lote = cronometrar(app.salvar_notas_lote, [(a, "POR", c) for a, _, c in lancamentos])
+    fechar(app)
+
+    print(f"escrita ({alunos} disciplinas x {len(enote.COMPONENTES_PADRAO)} componentes)")
+    print(f"  um commit por aluno:   {alunos / por_aluno:10.0f} linhas/s ({por_aluno:.2f} s)")
+    print(f"  salvar_notas_lote:     {alunos / em_lote:10.0f} linhas/s ({em_lote:.2f} s)")
+
+
+# ======================================================
+# MEMÓRIA: DICTS x REGISTROS COM __slots__
+# ======================================================
+def medir_memoria(pasta, alunos, disciplinas=12):
+    """ Alunos e notas em memória no formato antigo (dicts) e com Aluno/NotaDisciplina/Componente. """
+    def com_dicts():
+        lista = {f"A{i:07d}": {"nome": f"Aluno {i}", "matricula": f"M{i}", "data_nascimento": "",
+                               "turma": f"T{i % 250}", "contato": ""} for i in range(alunos)}
+        notas = {aluno_id: [{"pk_id": i * disciplinas + d, "disciplina": f"D{d}",
+                             "componentes": [{"nome": c.nome, "nota": c.nota, "peso": c.peso} for c in componentes(i, d)]}
+                            for d in range(disciplinas)]
+                 for i, aluno_id in enumerate(lista)}
+        return lista, notas
+
+    def com_slots():
+        lista = {f"A{i:07d}": enote.Aluno(f"A{i:07d}", f"Aluno {i}", f"T{i % 250}", f"M{i}") for i in range(alunos)}
+        notas = {aluno_id: [enote.NotaDisciplina(i * disciplinas + d, f"D{d}", componentes(i, d))
+                            for d in range(disciplinas)]
+                 for i, aluno_id in enumerate(lista)}
+        return lista, notas
+
+    print(f"memória ({alunos} alunos x {disciplinas} disciplinas x {len(enote.COMPONENTES_PADRAO)} componentes)")
+    for rotulo, montar in (("dicts", com_dicts), ("__slots__", com_slots)):
+        tracemalloc.start()
+        dados = montar()
+        usado, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del dados
+        print(f"  {rotulo:<10} {usado / 2 ** 20:8.1f} MB")
+
+
+# ======================================================
+# MÉDIAS NO SQLITE x OBJETOS PYTHON
+# ======================================================
+def medir_medias_sql(pasta, alunos):
+    """ "Alunos abaixo de 6,0 na turma X" calculado no SQLite contra carregar tudo e calcular em Python. """
+    app = criar_app(os.path.join(pasta, "medias.db"))
+    ids = povoar(app, alunos)
+    turma = "T000"
+
+    def em_python():
+        app.notas = enote.CacheLRU(len(ids))
+        app.cursor.execute("SELECT id, nome, turma FROM alunos")
+        abaixo = []
+        for aluno_id, nome, turma_aluno in app.cursor.fetchall():
+            medias = [app.calcular_media_por_disciplina(n) for n in app.obter_notas(aluno_id)]
+            media = app.calcular_media_geral(medias)
+            if turma_aluno == turma and media < enote.MEDIA_APROVACAO:
+                abaixo.append((aluno_id, nome, turma_aluno, media))
+        return sorted(abaixo, key=lambda linha: (linha[3], linha[0]))
+
+    sql_turma, t_turma = cronometrar(enote.medias_alunos_sql, app.cursor, app.politica_media, turma, enote.MEDIA_APROVACAO)
+    _, t_escola = cronometrar(enote.medias_alunos_sql, app.cursor, app.politica_media, None, enote.MEDIA_APROVACAO)
+    python, t_python = cronometrar(em_python)
+    app.cursor.execute("SELECT COUNT(*) FROM componentes")
+    linhas = app.cursor.fetchone()[0]
+    fechar(app)
+    assert sorted(sql_turma, key=lambda linha: (linha[3], linha[0])) == python
+
+    print(f"médias abaixo de 6,0 ({alunos} alunos, {linhas} componentes)")
+    print(f"  SQLite, uma turma:         {t_turma * 1000:8.1f} ms")
+    print(f"  SQLite, escola toda:       {t_escola * 1000:8.1f} ms")
+    print(f"  carregar tudo + Python:    {t_python * 1000:8.1f} ms")
+
+
+# ======================================================
+# MELHORES E PIORES SEM ORDENAR TUDO
+# ======================================================
+def extremos_medias_lote(app, n, turma=None, piores=False):
+    """ As n maiores (ou menores) médias gerais recalculadas pelos componentes, com um heap. """
+    medias = enote.ArmazemColunar.carregar(app.conexao.cursor(), turma).calcular_medias(app.politica_media)
+    return enote.extremos_em_memoria(medias['aluno'], n, piores)
+
+
+def medir_extremos(pasta, alunos, n=50):
+    """ As n menores médias da escola: índice (LIMIT n) e heap contra ordenar tudo. """
+    app = criar_app(os.path.join(pasta, "extremos.db"))
+    povoar(app, alunos, turmas=250, disciplinas=DISCIPLINAS[:2])
+
+    def carregar_e_ordenar():
+        app.cursor.execute("SELECT id, nome, turma, media FROM alunos WHERE media IS NOT NULL")
+        return sorted(app.cursor.fetchall(), key=lambda linha: linha[3])[:n]
+
+    indice, t_indice = cronometrar(enote.extremos_sql, app.cursor, n, None, None, True)
+    ordenado, t_ordenado = cronometrar(carregar_e_ordenar)
+    medias = enote.ArmazemColunar.carregar(app.conexao.cursor()).calcular_medias(app.politica_media)['aluno']
+    heap, t_heap = cronometrar(enote.extremos_em_memoria, medias, n, True)
+    ordenado_memoria, t_sorted = cronometrar(lambda: sorted(medias.items(), key=lambda item: item[1])[:n])
+    lote, t_lote = cronometrar(extremos_medias_lote, app, n, None, True)
+    _, t_turmas = cronometrar(enote.melhores_por_turma_sql, app.cursor)
+    fechar(app)
+    assert [linha[3] for linha in indice] == [linha[3] for linha in ordenado]
+    assert [media for _, media in heap] == [media for _, media in ordenado_memoria] == [media for _, media in lote]
+
+    print(f"{n} menores médias ({alunos} alunos, 250 turmas)")
+    print(f"  SQL pelo índice (LIMIT):          {t_indice * 1000:8.2f} ms")
+    print(f"  SQL lendo tudo + sorted:          {t_ordenado * 1000:8.2f} ms")
+    print(f"  heap sobre {{aluno: média}}:        {t_heap * 1000:8.2f} ms")
+    print(f"  sorted sobre {{aluno: média}}:      {t_sorted * 1000:8.2f} ms")
+    print(f"  recalculando em lote + heap:      {t_lote * 1000:8.2f} ms")
+    print(f"  melhor de cada turma (índice):    {t_turmas * 1000:8.2f} ms")
+
+
+# ======================================================
+# BUSCA INCREMENTAL DE ALUNOS
+# ======================================================
+NOMES = ["Ana", "Maria", "João", "José", "Antônio", "Francisca", "Carlos", "Paulo", "Adriana", "Lucas",
+         "Juliana", "Marcos", "Fernanda", "Pedro", "Aline", "Rafael", "Sandra", "Bruno", "Patrícia", "Gabriel"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima",
+              "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes"]
+CONSULTAS_BUSCA = ["a", "mar", "maria", "a s", "de s", "mar sil", "ana de souza", "t017", "zzz"]
+
+
+def medir_busca(pasta, alunos, repeticoes=5):
+    """ Uma busca do zero (sem o resultado anterior) por consulta, no IndiceBusca de alunos alunos. """
+    sorteio = random.Random(23)
+    indice = enote.IndiceBusca()
+    for i in range(alunos):
+        nome = f"{sorteio.choice(NOMES)} {sorteio.choice(['de', 'da', 'dos', ''])} {sorteio.choice(SOBRENOMES)}"
+        indice.adicionar(f"A{i:07d}", " ".join(nome.split()), f"T{i % 250:03d}", f"M{i}")
+
+    print(f"busca ({alunos} alunos, melhor de {repeticoes})")
+    for consulta in CONSULTAS_BUSCA:
+        melhor = None
+        for _ in range(repeticoes):
+            indice.anterior = ((), None)
+            resultado, tempo = cronometrar(indice.buscar, consulta)
+            melhor = tempo if melhor is None else min(melhor, tempo)
+        print(f"  {consulta!r:<16} {len(resultado):7d} alunos {melhor * 1000:8.2f} ms")
+
+
+MEDICOES = {
+    "escrita": (medir_escrita, 2000),
+    "memoria": (medir_memoria, 5000),
+    "medias_sql": (medir_medias_sql, 8400),
+    "extremos": (medir_extremos, 100000),
+    "busca": (medir_busca, 100000),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Medições de desempenho do ENOTE.")
+    parser.add_argument("medicoes", nargs="*", metavar="medicao",
+                        help=f"uma ou mais entre {', '.join(MEDICOES)} (padrão: todas)")
+    parser.add_argument("--alunos", type=int, help="quantidade de alunos (cada medição tem seu padrão)")
+    args = parser.parse_args()
+    for nome in args.medicoes:
+        if nome not in MEDICOES:
+            parser.error(f"medição desconhecida: {nome}")
+    pasta = tempfile.mkdtemp()
+    try:
+        for nome in args.medicoes or MEDICOES:
+            medir, padrao = MEDICOES[nome]
+            medir(pasta, args.alunos or padrao)
+    finally:
+        shutil.rmtree(pasta)
+
+
+if __name__ == "__main__":
+    main()
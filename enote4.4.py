@@ -4,34 +4,1621 @@ import sqlite3
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
 from functools import partial
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, CancelledError
+import threading
+import time
+import math
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import queue
+import csv
+import heapq
+import sys
+import argparse
+from array import array
+from bisect import bisect_left, insort
+import unicodedata
 import webbrowser
 import os
 
+# NumPy é opcional: se estiver instalado, o ArmazemColunar usa operações vetorizadas
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CAMINHO_BANCO = "banco_completo.db"
+
+# Modo WAL: leituras na conexão da interface nunca esperam as gravações, que são
+# feitas por uma única thread de escrita (EscritorSQLite). O WAL exige que todos
+# os processos que abrem o arquivo estejam na mesma máquina, então fica desligado
+# por padrão (banco em pasta de rede compartilhada). Ligue só se todos usarem o
+# banco no mesmo computador. O modo fica gravado no arquivo; com False, o banco
+# volta ao diário de rollback padrão ao abrir.
+USAR_ESCRITOR_WAL = False
+
+# Quantidade máxima de alunos com notas mantidas em memória
+TAMANHO_CACHE_NOTAS = 500
+
+# Linhas buscadas de uma vez pela lista de alunos (ListaVirtual) ao rolar
+TAMANHO_PAGINA_LISTA = 200
+
+# Tarefas em segundo plano (ExecutorTarefas): intervalo de consulta pela thread do Tk
+# e tempo até aparecer a janela de progresso (tarefas rápidas não mostram janela)
+INTERVALO_TAREFAS_MS = 50
+ATRASO_JANELA_PROGRESSO_MS = 300
+
+# Notas e médias são inteiros em centésimos (7,25 -> 725) do banco até a tela;
+# só formatar_nota/ler_nota convertem para texto
+ESCALA_NOTA = 100
+NOTA_MAXIMA = 10 * ESCALA_NOTA
+
+# Componentes sugeridos para uma disciplina nova
+COMPONENTES_PADRAO = ["Trabalho 1", "Trabalho 2", "Teste", "Prova"]
+
+# Média mínima para aprovação (em centésimos)
+MEDIA_APROVACAO = 600
+# Média mínima para recuperação (abaixo dela, reprovado)
+MEDIA_RECUPERACAO = 400
+
+# Índices secundários, pensados a partir das consultas que o app realmente faz,
+# com a versão do esquema (MIGRACOES) em que cada um foi criado
+INDICES = {
+    "idx_notas_aluno": ("notas(aluno_id)", 4),             # notas de um aluno (obter_notas)
+    "idx_notas_disciplina": ("notas(disciplina)", 4),      # uma disciplina em todos os alunos
+    "idx_notas_rev": ("notas(rev)", 4),                    # sincronização incremental
+    "idx_componentes_nota": ("componentes(nota_pk, ordem)", 4),  # componentes de uma disciplina, já ordenados
+    "idx_alunos_turma": ("alunos(turma, nome)", 4),        # alunos de uma turma, em ordem alfabética
+    "idx_alunos_matricula": ("alunos(matricula)", 4),      # busca por matrícula
+    "idx_alunos_rev": ("alunos(rev)", 4),                  # sincronização incremental
+    "idx_alunos_media": ("alunos(media)", 5),              # ranking/reprovados na escola toda
+    "idx_alunos_turma_media": ("alunos(turma, media)", 5), # ranking/reprovados de uma turma
+    "idx_notas_disciplina_media": ("notas(disciplina, media)", 5),  # ranking/reprovados por disciplina
+}
+
+# Média de cada disciplina lançada calculada pelo próprio SQLite. {media} é a
+# expressao_sql da política de média ativa (disciplina sem componentes vale 0)
+SQL_MEDIAS_DISCIPLINAS = """
+    SELECT n.pk_id, n.aluno_id, a.nome, a.turma, n.disciplina, {media} AS media
+    FROM alunos a
+    JOIN notas n ON n.aluno_id = a.id
+    LEFT JOIN componentes c ON c.nota_pk = n.pk_id
+    {filtro}
+    GROUP BY n.pk_id
+"""
+
+# Índices que começam por alunos.turma: qualquer um serve para filtrar uma turma
+POR_TURMA = ("idx_alunos_turma", "idx_alunos_turma_media")
+
+# Consultas mais frequentes e o índice que cada uma deve usar (verificar_plano_consultas).
+# Uma tupla de nomes aceita qualquer um deles (índices com as mesmas colunas iniciais).
+CONSULTAS_QUENTES = {
+    "notas_do_aluno": ("""
+        SELECT n.pk_id, n.disciplina, c.nome, c.nota, c.peso
+        FROM notas n LEFT JOIN componentes c ON c.nota_pk = n.pk_id
+        WHERE n.aluno_id = ?
+        ORDER BY n.pk_id, c.ordem
+    """, ("",), ["idx_notas_aluno", "idx_componentes_nota"]),
+    "componentes_da_nota": ("DELETE FROM componentes WHERE nota_pk = ?", (0,), ["idx_componentes_nota"]),
+    "alunos_da_turma": ("SELECT id, nome FROM alunos WHERE turma = ? ORDER BY nome", ("",), ["idx_alunos_turma"]),
+    "aluno_por_matricula": ("SELECT id FROM alunos WHERE matricula = ?", ("",), ["idx_alunos_matricula"]),
+    "notas_da_disciplina": ("SELECT pk_id, aluno_id FROM notas WHERE disciplina = ?", ("",),
+                            [("idx_notas_disciplina", "idx_notas_disciplina_media")]),
+    "alunos_alterados": ("SELECT id, nome, turma, rev FROM alunos WHERE rev > ?", (0,), ["idx_alunos_rev"]),
+    "notas_alteradas": ("SELECT aluno_id, rev FROM notas WHERE rev > ?", (0,), ["idx_notas_rev"]),
+    "turma_por_media": ("""
+        SELECT id, nome, turma, media FROM alunos
+        WHERE turma = ? AND media IS NOT NULL ORDER BY media DESC
+    """, ("",), ["idx_alunos_turma_media"]),
+    "reprovados": ("SELECT id, nome, turma, media FROM alunos WHERE media < ? ORDER BY media", (0,), ["idx_alunos_media"]),
+    "piores_da_escola": ("""
+        SELECT id, nome, turma, media FROM alunos WHERE media IS NOT NULL ORDER BY media LIMIT ?
+    """, (0,), ["idx_alunos_media"]),
+    "melhores_da_escola": ("""
+        SELECT id, nome, turma, media FROM alunos WHERE media IS NOT NULL ORDER BY media DESC LIMIT ?
+    """, (0,), ["idx_alunos_media"]),
+    "extremos_da_disciplina": ("""
+        SELECT n.aluno_id, a.nome, a.turma, n.media FROM notas n JOIN alunos a ON a.id = n.aluno_id
+        WHERE n.disciplina = ? AND n.media IS NOT NULL ORDER BY n.media DESC LIMIT ?
+    """, ("", 0), ["idx_notas_disciplina_media"]),
+    "medias_da_turma_sql": (SQL_MEDIAS_DISCIPLINAS.format(filtro="WHERE a.turma = ?", media="SUM(c.nota)"), ("",),
+                            [POR_TURMA, "idx_notas_aluno", "idx_componentes_nota"]),
+    "disciplina_da_turma": ("""
+        SELECT n.aluno_id, n.pk_id, n.media FROM alunos a JOIN notas n ON n.aluno_id = a.id
+        WHERE a.turma = ? AND n.disciplina = ? AND n.media IS NOT NULL
+    """, ("", ""), ["idx_notas_disciplina_media"]),
+    "componentes_da_turma": ("""
+        SELECT n.aluno_id, n.pk_id, c.nome, c.nota, c.peso
+        FROM alunos a JOIN notas n ON n.aluno_id = a.id LEFT JOIN componentes c ON c.nota_pk = n.pk_id
+        WHERE a.turma = ? AND n.disciplina = ?
+        ORDER BY n.pk_id, c.ordem
+    """, ("", ""), ["idx_componentes_nota"]),
+    "medias_disciplinas_da_turma": ("""
+        SELECT a.turma, n.disciplina, n.media FROM alunos a JOIN notas n ON n.aluno_id = a.id
+        WHERE a.turma = ? AND n.media IS NOT NULL
+    """, ("",), [POR_TURMA, "idx_notas_aluno"]),
+    "reprovados_disciplina": ("""
+        SELECT aluno_id, media FROM notas WHERE disciplina = ? AND media < ? ORDER BY media
+    """, ("", 0), ["idx_notas_disciplina_media"]),
+}
+
+def verificar_plano_consultas(cursor):
+    """
+    Roda EXPLAIN QUERY PLAN nas CONSULTAS_QUENTES e retorna {nome: plano}
+    das que não usam os índices esperados (vazio = tudo indexado).
+    """
+    problemas = {}
+    for nome, (sql, params, indices) in CONSULTAS_QUENTES.items():
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        plano = [row[3] for row in cursor.fetchall()]
+        usados = {palavra for passo in plano for palavra in passo.split()}  # nome inteiro, não prefixo
+        if not all(usados.intersection((idx,) if isinstance(idx, str) else idx) for idx in indices):
+            problemas[nome] = plano
+    return problemas
+
+class CacheLRU:
+    """ Dicionário de tamanho limitado: descarta o item usado há mais tempo. """
+    def __init__(self, tamanho_max):
+        self.tamanho_max = tamanho_max
+        self.dados = OrderedDict()
+
+    def __contains__(self, chave):
+        return chave in self.dados
+
+    def __len__(self):
+        return len(self.dados)
+
+    def get(self, chave, padrao=None):
+        if chave not in self.dados:
+            return padrao
+        self.dados.move_to_end(chave)
+        return self.dados[chave]
+
+    def __setitem__(self, chave, valor):
+        self.dados[chave] = valor
+        self.dados.move_to_end(chave)
+        while len(self.dados) > self.tamanho_max:
+            self.dados.popitem(last=False)
+
+    def pop(self, chave, padrao=None):
+        return self.dados.pop(chave, padrao)
+
+    def clear(self):
+        self.dados.clear()
+
+class MemoMedias:
+    """
+    Médias já calculadas, por aluno: {aluno_id: {pk_id: média da disciplina, None: média geral}}.
+    invalidar(aluno_id) deve ser chamado sempre que as notas do aluno mudarem.
+    """
+    def __init__(self, tamanho_max):
+        self.cache = CacheLRU(tamanho_max)
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, aluno_id, chave, calcular):
+        entrada = self.cache.get(aluno_id)
+        if entrada is None:
+            entrada = {}
+            self.cache[aluno_id] = entrada
+        if chave in entrada:
+            self.acertos += 1
+            return entrada[chave]
+        self.falhas += 1
+        entrada[chave] = valor = calcular()
+        return valor
+
+    def invalidar(self, aluno_id):
+        self.cache.pop(aluno_id)
+
+    def limpar(self):
+        self.cache.clear()
+
+    def estatisticas(self):
+        total = self.acertos + self.falhas
+        return {"acertos": self.acertos, "falhas": self.falhas,
+                "taxa_acerto": self.acertos / total if total else 0.0}
+
+class IndiceRanking:
+    """
+    Classificação por média, mantida em ordem: lista de (-media, ident) ordenada
+    com bisect. ident é o aluno_id (média geral) ou (aluno_id, pk_id) (disciplina).
+    Posição, top N e percentil são buscas binárias; atualizar() troca só a entrada do aluno.
+    Empates dividem a posição (1, 2, 2, 4).
+    """
+    def __init__(self, pares=()):
+        self.medias = dict(pares)
+        self.ordem = sorted((-media, ident) for ident, media in self.medias.items())
+
+    def __len__(self):
+        return len(self.ordem)
+
+    def __contains__(self, ident):
+        return ident in self.medias
+
+    def remover(self, ident):
+        media = self.medias.pop(ident, None)
+        if media is not None:
+            del self.ordem[bisect_left(self.ordem, (-media, ident))]
+
+    def atualizar(self, ident, media):
+        """ Grava a nova média de ident (None tira o aluno da classificação). """
+        self.remover(ident)
+        if media is not None:
+            self.medias[ident] = media
+            insort(self.ordem, (-media, ident))
+
+    def posicao(self, ident):
+        """ Posição (a partir de 1) de ident, ou None se não estiver classificado. """
+        media = self.medias.get(ident)
+        if media is None:
+            return None
+        return bisect_left(self.ordem, (-media,)) + 1
+
+    def percentil(self, ident):
+        """ Percentual dos classificados com média menor ou igual à de ident. """
+        posicao = self.posicao(ident)
+        if posicao is None:
+            return None
+        return 100.0 * (len(self.ordem) - posicao + 1) / len(self.ordem)
+
+    def top(self, n):
+        """ [(ident, media)] das n maiores médias. """
+        return [(ident, -chave) for chave, ident in self.ordem[:n]]
+
+    def ultimos(self, n):
+        """ [(ident, media)] das n menores médias, da menor para a maior. """
+        return [(ident, -chave) for chave, ident in reversed(self.ordem[-n:])] if n > 0 else []
+
+def normalizar_busca(texto):
+    """ Minúsculas e sem acentos, para a busca: "José" e "jose" se encontram. """
+    texto = texto.casefold()
+    if texto.isascii():
+        return texto
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+class ResultadoBusca:
+    """
+    aluno_ids encontrados por IndiceBusca.buscar, na ordem de inclusão. Guarda só os
+    números de documento; o aluno_id é obtido no trecho lido (a lista mostra ~25 por vez).
+    """
+    __slots__ = ("documentos", "ids")
+
+    def __init__(self, documentos, ids):
+        self.documentos = documentos
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.documentos)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self.ids[d] for d in self.documentos[indice]]
+        return self.ids[self.documentos[indice]]
+
+    def __iter__(self):
+        return (self.ids[d] for d in self.documentos)
+
+class IndiceBusca:
+    """
+    Busca incremental de alunos por nome, turma, matrícula e ID. Cada aluno é um
+    documento (número sequencial, na ordem de inclusão) com o texto normalizado;
+    as 1, 2 e 3 primeiras letras de cada palavra apontam para um array crescente
+    de documentos. Cada termo buscado precisa ser o início de alguma palavra
+    ("mar sil" acha "Maria da Silva"). A busca intersecta as listas dos prefixos dos
+    termos (e o resultado anterior, quando o texto só foi completado), da menor para
+    a maior, e confere no texto só os termos com mais de 3 letras.
+    """
+    def __init__(self):
+        self.postagens = {}   # prefixo -> array('i') de documentos
+        self.textos = []      # documento -> " texto normalizado" (None se reindexado)
+        self.ids = []         # documento -> aluno_id
+        self.documento = {}   # aluno_id -> documento atual
+        self.exatos = {}      # ID ou matrícula normalizados -> {aluno_id}
+        self.chaves_exatas = {}
+        self.anterior = ((), None)  # (termos, documentos) da última busca
+
+    def __len__(self):
+        return len(self.documento)
+
+    def prefixos(self, texto):
+        return {palavra[:n] for palavra in texto.split() for n in (1, 2, 3)}
+
+    def adicionar(self, aluno_id, nome, turma, matricula=""):
+        """ Indexa o aluno; se ele já estava no índice, a entrada antiga é removida. """
+        antigo = self.documento.get(aluno_id)
+        if antigo is not None:
+            for prefixo in self.prefixos(self.textos[antigo]):
+                self.postagens[prefixo].remove(antigo)
+            self.textos[antigo] = None
+            for chave in self.chaves_exatas[aluno_id]:
+                self.exatos[chave].discard(aluno_id)
+        documento = len(self.textos)
+        texto = normalizar_busca(f" {nome} {turma} {matricula or ''} {aluno_id}")
+        self.textos.append(texto)
+        self.ids.append(aluno_id)
+        self.documento[aluno_id] = documento
+        postagens = self.postagens
+        for palavra in texto.split():
+            for prefixo in (palavra[:1], palavra[:2], palavra[:3]):
+                lista = postagens.get(prefixo)
+                if lista is None:
+                    postagens[prefixo] = array('i', (documento,))
+                elif not lista or lista[-1] != documento:  # Palavras com o mesmo início no mesmo aluno
+                    lista.append(documento)
+        chaves = {normalizar_busca(campo.strip()) for campo in (aluno_id, matricula) if campo and campo.strip()}
+        for chave in chaves:
+            self.exatos.setdefault(chave, set()).add(aluno_id)
+        self.chaves_exatas[aluno_id] = chaves
+        self.anterior = ((), None)
+
+    def buscar(self, texto):
+        """ ResultadoBusca com os alunos encontrados; None se o texto não tem termos (sem filtro). """
+        termos = tuple(normalizar_busca(texto).split())
+        if not termos:
+            return None
+        anteriores, candidatos = self.anterior
+        if candidatos is not None and not (len(termos) >= len(anteriores)
+                                           and all(t.startswith(a) for t, a in zip(termos, anteriores))):
+            candidatos = None  # Só dá para partir do resultado anterior se o texto foi completado
+        listas = [self.postagens.get(prefixo, ()) for prefixo in {termo[:3] for termo in termos}]
+        if candidatos is not None and len(candidatos) < max(map(len, listas)):
+            listas.append(candidatos)
+        listas.sort(key=len)
+        documentos = listas[0]  # Um só prefixo: a própria lista já é a resposta
+        if len(listas) > 1:
+            comuns = set(documentos)
+            for lista in listas[1:]:
+                if not comuns:
+                    break
+                comuns = comuns.intersection(lista)
+            documentos = sorted(comuns)
+        procurados = [" " + termo for termo in termos if len(termo) > 3]
+        textos = self.textos
+        if len(procurados) == 1:
+            procurado = procurados[0]
+            documentos = [d for d in documentos if procurado in textos[d]]
+        elif procurados:
+            documentos = [d for d in documentos if all(p in textos[d] for p in procurados)]
+        self.anterior = (termos, documentos)
+        return ResultadoBusca(documentos, self.ids)
+
+    def localizar(self, texto):
+        """ aluno_id cujo ID ou matrícula é exatamente texto, ou None (inexistente ou ambíguo). """
+        encontrados = self.exatos.get(normalizar_busca(texto).strip(), ())
+        return next(iter(encontrados)) if len(encontrados) == 1 else None
+
+# ======================================================
+# REGISTROS (__slots__ evita um dicionário por objeto)
+# ======================================================
+class Aluno:
+    """ Entrada da lista de alunos mantida em memória. """
+    __slots__ = ("id", "nome", "turma", "matricula")
+
+    def __init__(self, id, nome, turma, matricula=""):
+        self.id = id
+        self.nome = nome
+        self.turma = turma
+        self.matricula = matricula or ""
+
+class Componente:
+    """ Uma avaliação (Trabalho, Prova...) de uma disciplina. """
+    __slots__ = ("nome", "nota", "peso")
+
+    def __init__(self, nome, nota=0, peso=1):
+        self.nome = nome
+        self.nota = nota
+        self.peso = peso
+
+class NotaDisciplina:
+    """ Linha da tabela notas com seus componentes. """
+    __slots__ = ("pk_id", "disciplina", "componentes")
+
+    def __init__(self, pk_id, disciplina, componentes):
+        self.pk_id = pk_id
+        self.disciplina = disciplina
+        self.componentes = componentes
+
+def dividir_arredondado(numerador, denominador):
+    """ numerador / denominador arredondado ao inteiro mais próximo (meio para cima), só com inteiros. """
+    return (2 * numerador + denominador) // (2 * denominador)
+
+def formatar_centesimos(centesimos, casas=2):
+    """
+    Nota ou média em centésimos como texto ("7,25"), sem passar por float.
+    Com casas=1 só omite o último dígito quando ele é zero; nunca arredonda a nota.
+    """
+    texto = f"{centesimos // ESCALA_NOTA},{centesimos % ESCALA_NOTA:02d}"
+    return texto[:-1] if casas == 1 and texto.endswith("0") else texto
+
+def ler_centesimos(texto):
+    """ Nota digitada ("7,5" ou "7.5") em centésimos; ValueError se não for um número de 0 a 10. """
+    try:
+        nota = Decimal(str(texto).strip().replace(',', '.'))
+        centesimos = int((nota * ESCALA_NOTA).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        raise ValueError(texto)
+    if not (0 <= centesimos <= NOTA_MAXIMA): raise ValueError(texto)
+    return centesimos
+
+# ======================================================
+# MELHORES E PIORES MÉDIAS (SEM ORDENAR TUDO)
+# ======================================================
+def extremos_em_memoria(medias, n, piores=False):
+    """
+    [(chave, media)] das n maiores (ou menores) médias de um dicionário {chave: media},
+    ex.: ArmazemColunar.calcular_medias()['aluno']. Usa um heap de tamanho n: O(total * log n), sem ordenar tudo.
+    """
+    escolher = heapq.nsmallest if piores else heapq.nlargest
+    return escolher(n, medias.items(), key=lambda item: item[1])
+
+def extremos_sql(cursor, n, turma=None, disciplina=None, piores=False):
+    """
+    [(aluno_id, nome, turma, media)] das n maiores (ou menores) médias gravadas, direto do
+    índice (ORDER BY media LIMIT n lê só n entradas). disciplina=None usa a média geral.
+    """
+    if disciplina is not None:
+        sql, params = CONSULTAS_QUENTES["extremos_da_disciplina"][0], [disciplina, n]
+        if turma is not None:
+            sql = sql.replace("WHERE n.disciplina = ?", "WHERE n.disciplina = ? AND a.turma = ?")
+            params.insert(1, turma)
+    elif turma is None:
+        sql, params = CONSULTAS_QUENTES["melhores_da_escola"][0], [n]
+    else:
+        sql, params = CONSULTAS_QUENTES["turma_por_media"][0] + " LIMIT ?", [turma, n]
+    if piores:
+        sql = sql.replace("DESC", "")
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+def abaixo_da_media_sql(cursor, corte, turma=None):
+    """ [(aluno_id, nome, turma, media)] com média geral gravada abaixo do corte, da menor para a maior. """
+    if turma is None:
+        cursor.execute(CONSULTAS_QUENTES["reprovados"][0], (corte,))
+    else:
+        cursor.execute("""
+            SELECT id, nome, turma, media FROM alunos
+            WHERE turma = ? AND media < ? ORDER BY media
+        """, (turma, corte))
+    return cursor.fetchall()
+
+def melhores_por_turma_sql(cursor):
+    """ [(turma, aluno_id, nome, media)]: a maior média de cada turma, uma busca no índice por turma. """
+    cursor.execute("SELECT DISTINCT turma FROM alunos ORDER BY turma")
+    resultado = []
+    for (turma,) in cursor.fetchall():
+        for aluno_id, nome, _, media in extremos_sql(cursor, 1, turma):
+            resultado.append((turma, aluno_id, nome, media))
+    return resultado
+
+def sql_medias_disciplinas(politica, filtro):
+    """ SQL_MEDIAS_DISCIPLINAS para a política; sem expressão SQL, usa a média gravada (notas.media). """
+    return SQL_MEDIAS_DISCIPLINAS.format(filtro=filtro, media=politica.expressao_sql or "n.media")
+
+def medias_por_disciplina_sql(cursor, politica, turma=None):
+    """
+    [(disciplina, média entre os alunos)] da turma ou da escola, calculadas no SQLite a partir
+    dos componentes, sem montar objetos Python por nota. Mesmo arredondamento de dividir_arredondado.
+    """
+    filtro, params = ("WHERE a.turma = ?", (turma,)) if turma is not None else ("", ())
+    cursor.execute(f"""
+        SELECT disciplina, (2 * SUM(media) + COUNT(media)) / (2 * COUNT(media))
+        FROM ({sql_medias_disciplinas(politica, filtro)})
+        GROUP BY disciplina ORDER BY disciplina
+    """, params)
+    return cursor.fetchall()
+
+def medias_alunos_sql(cursor, politica, turma=None, abaixo_de=None):
+    """
+    [(aluno_id, nome, turma, media_geral)] calculadas no SQLite a partir dos componentes, da menor
+    para a maior; com abaixo_de, só as menores que esse valor (ex.: "abaixo de 6,0 na turma X").
+    """
+    filtro, params = ("WHERE a.turma = ?", [turma]) if turma is not None else ("", [])
+    sql = f"""
+        SELECT aluno_id, nome, turma, (2 * SUM(media) + COUNT(media)) / (2 * COUNT(media)) AS media_geral
+        FROM ({sql_medias_disciplinas(politica, filtro)})
+        GROUP BY aluno_id
+    """
+    if abaixo_de is not None:
+        sql += " HAVING media_geral < ?"
+        params.append(abaixo_de)
+    cursor.execute(sql + " ORDER BY media_geral", params)
+    return cursor.fetchall()
+
+# ======================================================
+# ARMAZÉM COLUNAR (ESTATÍSTICAS DA TURMA/ESCOLA)
+# ======================================================
+def somar_por_grupo(grupos, valores, n_grupos):
+    """
+    Soma e contagem de valores (array) por grupo (grupos[i] é o grupo de valores[i]).
+    Valores inteiros dão somas inteiras e exatas.
+    """
+    if np is not None and len(grupos):
+        g = np.frombuffer(grupos, dtype=np.intc)
+        somas = np.bincount(g, weights=np.frombuffer(valores, dtype=valores.typecode), minlength=n_grupos)
+        if valores.typecode != 'd':
+            somas = somas.round().astype(np.int64)  # Exato enquanto a soma couber em 2**53
+        return somas.tolist(), np.bincount(g, minlength=n_grupos).tolist()
+    somas = [0] * n_grupos
+    contagens = [0] * n_grupos
+    for grupo, valor in zip(grupos, valores):
+        somas[grupo] += valor
+        contagens[grupo] += 1
+    return somas, contagens
+
+# ======================================================
+# REGRAS DE SITUAÇÃO (APROVADO / RECUPERAÇÃO / REPROVADO)
+# ======================================================
+SITUACOES = ("Aprovado", "Recuperação", "Reprovado")  # Da melhor para a pior
+
+class RegrasSituacao:
+    """
+    Critérios de situação de uma disciplina: cortes de aprovação e de recuperação (em centésimos),
+    cortes próprios por disciplina e, opcionalmente, nota mínima por componente
+    (abaixo dela o aluno não passa de Recuperação). compilar() transforma as regras
+    em uma função por disciplina, chamada para cada nota sem reler a configuração.
+    """
+    def __init__(self, aprovacao=MEDIA_APROVACAO, recuperacao=MEDIA_RECUPERACAO,
+                 minimo_componente=None, por_disciplina=None):
+        self.aprovacao = aprovacao
+        self.recuperacao = recuperacao
+        self.minimo_componente = minimo_componente
+        self.por_disciplina = dict(por_disciplina or {})  # {disciplina: (aprovação, recuperação)}
+        self.compilar()
+
+    def compilar(self):
+        self.padrao = self.criar_avaliador(self.aprovacao, self.recuperacao)
+        self.avaliadores = {disciplina: self.criar_avaliador(aprovacao, recuperacao)
+                            for disciplina, (aprovacao, recuperacao) in self.por_disciplina.items()}
+
+    def criar_avaliador(self, aprovacao, recuperacao):
+        aprovado, em_recuperacao, reprovado = SITUACOES
+        minimo = self.minimo_componente
+        if minimo is None:
+            def avaliar(media, notas):
+                return aprovado if media >= aprovacao else em_recuperacao if media >= recuperacao else reprovado
+        else:
+            def avaliar(media, notas):
+                if media < recuperacao:
+                    return reprovado
+                if media < aprovacao or any(nota < minimo for nota in notas):
+                    return em_recuperacao
+                return aprovado
+        return avaliar
+
+    def avaliar(self, disciplina, media, notas):
+        """ Situação de uma disciplina a partir da média e das notas dos componentes. """
+        return self.avaliadores.get(disciplina, self.padrao)(media, notas)
+
+    def corte_aprovacao(self, disciplina):
+        """ Média de aprovação da disciplina: a própria, se houver, ou a geral. """
+        return self.por_disciplina.get(disciplina, (self.aprovacao, self.recuperacao))[0]
+
+    @staticmethod
+    def situacao_geral(situacoes):
+        """ Situação do aluno: a pior entre as disciplinas (None se não houver nenhuma). """
+        return max(situacoes, key=SITUACOES.index, default=None)
+
+    def para_json(self):
+        """ Regras para config (regras_situacao), com as notas de 0 a 10. """
+        def nota(centesimos):
+            return centesimos / ESCALA_NOTA if centesimos is not None else None
+        return json.dumps({"aprovacao": nota(self.aprovacao), "recuperacao": nota(self.recuperacao),
+                           "minimo_componente": nota(self.minimo_componente),
+                           "por_disciplina": {d: (nota(a), nota(r)) for d, (a, r) in self.por_disciplina.items()}})
+
+    @classmethod
+    def de_json(cls, texto):
+        """ Regras gravadas em config (regras_situacao); sem texto ou inválido, as padrão. """
+        def centesimos(nota):
+            return round(float(nota) * ESCALA_NOTA)
+        try:
+            dados = json.loads(texto)
+            # Disciplinas são gravadas em maiúsculas (regras salvas antes disso podem ter outra caixa)
+            por_disciplina = {d.strip().upper(): (centesimos(a), centesimos(r))
+                              for d, (a, r) in dados.get("por_disciplina", {}).items()}
+            minimo = dados.get("minimo_componente")
+            return cls(centesimos(dados["aprovacao"]), centesimos(dados["recuperacao"]),
+                       centesimos(minimo) if minimo is not None else None, por_disciplina)
+        except (TypeError, ValueError, KeyError, AttributeError):
+            return cls()
+
+# ======================================================
+# ESTATÍSTICAS EM FLUXO (UMA PASSADA, SEM GUARDAR AS NOTAS)
+# ======================================================
+class EstatisticaStreaming:
+    """
+    Média, variância, mínimo, máximo e histograma de 0 a 10 acumulados valor a valor
+    (notas em centésimos). Como os valores são inteiros, a soma e a soma dos quadrados
+    são exatas: não há o erro de cancelamento que o algoritmo de Welford evita em float,
+    e juntar() (ex.: as turmas de uma disciplina) é só somar os acumuladores.
+    """
+    __slots__ = ("quantidade", "soma", "soma_quadrados", "minimo", "maximo", "histograma")
+
+    def __init__(self, faixas=10):
+        self.quantidade = 0
+        self.soma = 0
+        self.soma_quadrados = 0
+        self.minimo = None
+        self.maximo = None
+        self.histograma = [0] * faixas
+
+    def adicionar(self, valor):
+        self.quantidade += 1
+        self.soma += valor
+        self.soma_quadrados += valor * valor
+        if self.minimo is None or valor < self.minimo: self.minimo = valor
+        if self.maximo is None or valor > self.maximo: self.maximo = valor
+        faixas = len(self.histograma)
+        self.histograma[min(max(valor * faixas // NOTA_MAXIMA, 0), faixas - 1)] += 1
+
+    def juntar(self, outra):
+        """ Acumula em self os valores de outra estatística. """
+        if not outra.quantidade:
+            return self
+        self.quantidade += outra.quantidade
+        self.soma += outra.soma
+        self.soma_quadrados += outra.soma_quadrados
+        self.minimo = outra.minimo if self.minimo is None else min(self.minimo, outra.minimo)
+        self.maximo = outra.maximo if self.maximo is None else max(self.maximo, outra.maximo)
+        self.histograma = [a + b for a, b in zip(self.histograma, outra.histograma)]
+        return self
+
+    @property
+    def media(self):
+        """ Média em centésimos (float; 0.0 sem valores). """
+        return self.soma / self.quantidade if self.quantidade else 0.0
+
+    @property
+    def variancia(self):
+        """ Variância populacional em centésimos² (0.0 com menos de dois valores). """
+        if self.quantidade < 2:
+            return 0.0
+        return (self.quantidade * self.soma_quadrados - self.soma * self.soma) / (self.quantidade * self.quantidade)
+
+    @property
+    def desvio_padrao(self):
+        return math.sqrt(self.variancia)
+
+def ler_csv_alunos(caminho, tarefa=None):
+    """
+    Lê um CSV de alunos (nome;matricula;data_nascimento;turma;contato, cabeçalho opcional).
+    Retorna ([dados], linhas ignoradas por não terem Nome ou Turma).
+    """
+    campos = ["nome", "matricula", "data_nascimento", "turma", "contato"]
+    lista, ignorados = [], 0
+    with open(caminho, newline='', encoding='utf-8') as f:
+        linhas = csv.reader(f, delimiter=';')
+        for row in linhas if tarefa is None else acompanhar_linhas(linhas, tarefa):
+            if not row or row[0].strip().lower() == "nome":
+                continue
+            dados = dict(zip(campos, [c.strip() for c in row] + [""] * len(campos)))
+            if not dados['nome'] or not dados['turma']:
+                ignorados += 1
+                continue
+            lista.append(dados)
+    return lista, ignorados
+
+def salvar_arquivo(caminho, texto):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write(texto)
+
+def acompanhar_linhas(linhas, tarefa, total=None, a_cada=5000):
+    """ Repassa as linhas (ex.: de um cursor) chamando tarefa.progresso a cada a_cada, o que permite cancelar no meio. """
+    for feitos, linha in enumerate(linhas, 1):
+        if feitos % a_cada == 0:
+            tarefa.progresso(feitos, total)
+        yield linha
+
+def ler_tabela_colada(texto):
+    """
+    Bloco copiado de uma planilha (células separadas por tabulação, linhas por quebra de linha)
+    como lista de linhas de células. A quebra de linha final que as planilhas acrescentam é ignorada.
+    """
+    linhas = texto.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    if len(linhas) > 1 and linhas[-1] == "":
+        linhas.pop()
+    return [linha.split('\t') for linha in linhas]
+
+def lancamentos_da_grade(disciplina, alunos, existentes, colunas, notas, pesos, peso_padrao):
+    """
+    (lancamentos, alteracoes) para salvar_notas_lote a partir do que foi alterado na grade de
+    notas da turma. alunos: [(aluno_id, nome)] na ordem das linhas; existentes: {aluno_id:
+    NotaDisciplina}; notas: {linha: {coluna: centésimos}} só das células alteradas e preenchidas;
+    pesos: {coluna: peso} só dos pesos alterados; peso_padrao: {coluna: peso} de um componente novo.
+    Só mudam as notas e os pesos alterados: componentes fora das colunas ou não editados ficam
+    como estão, célula vazia não grava nada e alunos sem nenhuma mudança ficam de fora.
+    """
+    lancamentos, alteracoes = [], []
+    for i, (aluno_id, _) in enumerate(alunos):
+        notas_aluno = notas.get(i, {})
+        if not notas_aluno and not pesos:
+            continue
+        atual = existentes.get(aluno_id)
+        antes = atual.componentes if atual else []
+        comps = [Componente(c.nome, c.nota, c.peso) for c in antes]
+        posicao = {c.nome.lower(): k for k, c in enumerate(comps)}
+        for j, nome in enumerate(colunas):
+            k = posicao.get(nome.lower())
+            if k is not None:
+                comps[k].nota = notas_aluno.get(j, comps[k].nota)
+                comps[k].peso = pesos.get(j, comps[k].peso)
+            elif j in notas_aluno:
+                comps.append(Componente(nome, notas_aluno[j], pesos.get(j, peso_padrao[j])))
+        if [(c.nome, c.nota, c.peso) for c in comps] == [(c.nome, c.nota, c.peso) for c in antes]:
+            continue
+        if atual is None:
+            lancamentos.append((aluno_id, disciplina, comps))
+        else:
+            alteracoes.append((aluno_id, atual.pk_id, comps))
+    return lancamentos, alteracoes
+
+def estatisticas_por_grupo(linhas):
+    """
+    Lê (turma, disciplina, valor) de qualquer iterável (ex.: um cursor) numa passada e retorna
+    {(turma, disciplina): EstatisticaStreaming}, com os totais em (turma, None), (None, disciplina)
+    e (None, None).
+    """
+    grupos = {}
+    for turma, disciplina, valor in linhas:
+        estatistica = grupos.get((turma, disciplina))
+        if estatistica is None:
+            estatistica = grupos[(turma, disciplina)] = EstatisticaStreaming()
+        estatistica.adicionar(valor)
+    totais = {}
+    for (turma, disciplina), estatistica in grupos.items():
+        for chave in ((turma, None), (None, disciplina), (None, None)):
+            totais.setdefault(chave, EstatisticaStreaming()).juntar(estatistica)
+    grupos.update(totais)
+    return grupos
+
+# ======================================================
+# POLÍTICAS DE MÉDIA
+# ======================================================
+class PoliticaMedia:
+    """
+    Regra que transforma os componentes de uma disciplina em média.
+    calcular() é a forma escalar (uma disciplina); calcular_lote() recebe um
+    ArmazemColunar e devolve array('q') com a média de cada disciplina lançada.
+    Notas e médias em centésimos; as somas são inteiras, então as duas formas
+    dão exatamente o mesmo resultado.
+    """
+    codigo = ""
+    descricao = ""
+    usa_peso = False
+    # Expressão SQL equivalente sobre componentes c (None = não expressável em SQL)
+    expressao_sql = None
+
+    def calcular(self, notas, pesos):
+        raise NotImplementedError
+
+    def calcular_lote(self, armazem):
+        raise NotImplementedError
+
+    def estimar_necessaria(self, notas, pesos, pendentes, corte):
+        """ Valor aproximado para as notas pendentes atingirem o corte (None = sem fórmula, só busca). """
+        return None
+
+    def nota_necessaria(self, notas, pesos, corte=MEDIA_APROVACAO):
+        """
+        Menor nota (múltiplo de 0,1, em centésimos) que, lançada em todos os componentes
+        ainda em 0,0, leva a média da disciplina ao corte. None se não houver componente
+        pendente; math.inf se nem 10 bastar. A média é monótona na nota pendente, então
+        a resposta é uma busca binária sobre calcular(); estimar_necessaria só a encurta.
+        """
+        pendentes = [i for i, nota in enumerate(notas) if nota == 0]
+        if not pendentes:
+            return None
+        simuladas = list(notas)
+        def atinge(decimos):
+            for i in pendentes:
+                simuladas[i] = decimos * ESCALA_NOTA // 10
+            return self.calcular(simuladas, pesos) >= corte
+        if not atinge(100):
+            return math.inf
+        estimativa = self.estimar_necessaria(notas, pesos, pendentes, corte)
+        if estimativa is None:
+            baixo, alto = 0, 100  # atinge(alto) é sempre verdadeiro
+            while baixo < alto:
+                meio = (baixo + alto) // 2
+                if atinge(meio): alto = meio
+                else: baixo = meio + 1
+            return baixo * ESCALA_NOTA // 10
+        decimos = min(max(math.ceil(estimativa * 10 / ESCALA_NOTA), 0), 100)
+        while decimos < 100 and not atinge(decimos):
+            decimos += 1
+        while decimos > 0 and atinge(decimos - 1):
+            decimos -= 1
+        return decimos * ESCALA_NOTA // 10
+
+class MediaSimples(PoliticaMedia):
+    codigo = "simples"
+    descricao = "Média simples"
+    expressao_sql = "COALESCE((2 * SUM(c.nota) + COUNT(c.nota)) / (2 * COUNT(c.nota)), 0)"
+
+    def calcular(self, notas, pesos):
+        return dividir_arredondado(sum(notas), len(notas)) if notas else 0
+
+    def estimar_necessaria(self, notas, pesos, pendentes, corte):
+        return (corte * len(notas) - sum(notas)) / len(pendentes)
+
+    def calcular_lote(self, armazem):
+        n = len(armazem.nota_pk)
+        somas, contagens = somar_por_grupo(armazem.comp_nota, armazem.comp_valor, n)
+        return array('q', [dividir_arredondado(somas[i], contagens[i]) if contagens[i] else 0 for i in range(n)])
+
+class MediaPonderada(PoliticaMedia):
+    """ Modelo do ENOTE 3.x: soma(nota * peso) / soma(pesos). """
+    codigo = "ponderada"
+    descricao = "Média ponderada (pesos)"
+    usa_peso = True
+    expressao_sql = "COALESCE((2 * SUM(c.nota * c.peso) + SUM(c.peso)) / (2 * SUM(c.peso)), 0)"
+
+    def calcular(self, notas, pesos):
+        soma_pesos = sum(pesos)
+        return dividir_arredondado(sum(n * p for n, p in zip(notas, pesos)), soma_pesos) if soma_pesos > 0 else 0
+
+    def estimar_necessaria(self, notas, pesos, pendentes, corte):
+        pesos_pendentes = sum(pesos[i] for i in pendentes)
+        if pesos_pendentes <= 0:
+            return None
+        return (corte * sum(pesos) - sum(n * p for n, p in zip(notas, pesos))) / pesos_pendentes
+
+    def calcular_lote(self, armazem):
+        n = len(armazem.nota_pk)
+        produtos = array('q', [v * p for v, p in zip(armazem.comp_valor, armazem.comp_peso)])
+        somas, _ = somar_por_grupo(armazem.comp_nota, produtos, n)
+        pesos, _ = somar_por_grupo(armazem.comp_nota, armazem.comp_peso, n)
+        return array('q', [dividir_arredondado(somas[i], pesos[i]) if pesos[i] > 0 else 0 for i in range(n)])
+
+class MelhoresN(PoliticaMedia):
+    """ Média simples das n maiores notas da disciplina (todas, se houver menos de n). """
+    usa_peso = False
+
+    def __init__(self, n):
+        self.n = n
+        self.codigo = f"melhores:{n}"
+        self.descricao = f"Melhores {n} notas"
+
+    def quantos(self, total):
+        return min(self.n, total)
+
+    def calcular(self, notas, pesos):
+        k = self.quantos(len(notas))
+        escolhidas = sorted(notas, reverse=True)[:k]
+        return dividir_arredondado(sum(escolhidas), k) if k else 0
+
+    def calcular_lote(self, armazem):
+        n = len(armazem.nota_pk)
+        if np is not None and len(armazem.comp_nota):
+            grupos = np.frombuffer(armazem.comp_nota, dtype=np.intc)
+            valores = np.frombuffer(armazem.comp_valor, dtype=armazem.comp_valor.typecode)
+            ordem = np.lexsort((-valores, grupos))  # por disciplina, notas da maior para a menor
+            g, v = grupos[ordem], valores[ordem]
+            contagens = np.bincount(g, minlength=n)
+            inicio = np.concatenate(([0], np.cumsum(contagens)[:-1]))
+            posicao = np.arange(len(g)) - inicio[g]
+            limite = np.array([self.quantos(int(c)) for c in contagens])
+            manter = posicao < limite[g]
+            somas = np.bincount(g[manter], weights=v[manter], minlength=n).round().astype(np.int64).tolist()
+            limite = limite.tolist()
+        else:
+            por_nota = [[] for _ in range(n)]
+            for nota, valor in zip(armazem.comp_nota, armazem.comp_valor):
+                por_nota[nota].append(valor)
+            somas, limite = [], []
+            for valores in por_nota:
+                k = self.quantos(len(valores))
+                somas.append(sum(sorted(valores, reverse=True)[:k]))
+                limite.append(k)
+        return array('q', [dividir_arredondado(somas[i], limite[i]) if limite[i] else 0 for i in range(n)])
+
+class DescartarMenor(MelhoresN):
+    """ Descarta a menor nota da disciplina (se houver mais de uma). """
+    def __init__(self):
+        super().__init__(0)
+        self.codigo = "descartar_menor"
+        self.descricao = "Descartar a menor nota"
+
+    def quantos(self, total):
+        return total - 1 if total > 1 else total
+
+def criar_politica_media(codigo):
+    """ Política a partir do código gravado em config ('simples', 'ponderada', 'descartar_menor', 'melhores:N'). """
+    if codigo == "ponderada":
+        return MediaPonderada()
+    if codigo == "descartar_menor":
+        return DescartarMenor()
+    if codigo and codigo.startswith("melhores:"):
+        try:
+            n = int(codigo.split(":", 1)[1])
+            if n > 0:
+                return MelhoresN(n)
+        except ValueError:
+            pass
+    return MediaSimples()
+
+class ArmazemColunar:
+    """
+    Notas em vetores contíguos (array), indexados por aluno, disciplina e componente,
+    lidos direto do banco sem passar por self.notas. Há dois níveis:
+    - uma posição por disciplina lançada (nota_*), na ordem de pk_id;
+    - uma posição por componente (comp_*), na ordem do componente na disciplina.
+    As notas ficam em centésimos inteiros ('i'), como no banco.
+    """
+    CONSULTA = """
+        SELECT n.aluno_id, a.turma, n.pk_id, n.disciplina, c.nome, c.nota, c.peso
+        FROM notas n
+        JOIN alunos a ON a.id = n.aluno_id
+        LEFT JOIN componentes c ON c.nota_pk = n.pk_id
+        {filtro}
+        ORDER BY n.pk_id, c.ordem
+    """
+
+    def __init__(self):
+        self.alunos, self.turmas, self.disciplinas = [], [], []
+        self.aluno_turma = array('i')
+        self.nota_aluno, self.nota_disciplina, self.nota_pk = array('i'), array('i'), array('q')
+        self.comp_nota = array('i')
+        self.comp_valor, self.comp_peso = array('i'), array('i')
+
+    @classmethod
+    def carregar(cls, cursor, turma=None, tarefa=None):
+        """ Monta o armazém a partir de um cursor, lendo linha a linha (com tarefa, informando o progresso). """
+        armazem = cls()
+        filtro, params = ("WHERE a.turma = ?", (turma,)) if turma is not None else ("", ())
+        cursor.execute(cls.CONSULTA.format(filtro=filtro), params)
+        linhas = cursor if tarefa is None else acompanhar_linhas(cursor, tarefa)
+        idx_aluno, idx_turma, idx_disc = {}, {}, {}
+        ultimo_pk = None
+        for aluno_id, turma_aluno, pk_id, disciplina, nome, nota, peso in linhas:
+            if pk_id != ultimo_pk:
+                ultimo_pk = pk_id
+                a = idx_aluno.get(aluno_id)
+                if a is None:
+                    a = idx_aluno[aluno_id] = len(armazem.alunos)
+                    armazem.alunos.append(aluno_id)
+                    t = idx_turma.get(turma_aluno)
+                    if t is None:
+                        t = idx_turma[turma_aluno] = len(armazem.turmas)
+                        armazem.turmas.append(turma_aluno)
+                    armazem.aluno_turma.append(t)
+                d = idx_disc.get(disciplina)
+                if d is None:
+                    d = idx_disc[disciplina] = len(armazem.disciplinas)
+                    armazem.disciplinas.append(disciplina)
+                armazem.nota_aluno.append(a)
+                armazem.nota_disciplina.append(d)
+                armazem.nota_pk.append(pk_id)
+            if nome is None:
+                continue  # disciplina sem componentes
+            armazem.comp_nota.append(len(armazem.nota_pk) - 1)
+            armazem.comp_valor.append(nota)
+            armazem.comp_peso.append(peso)
+        return armazem
+
+    def calcular_medias(self, politica=None):
+        """
+        Todas as médias do armazém numa passada só, com a mesma regra (a política
+        de média informada) e o mesmo arredondamento de calcular_media_por_disciplina/
+        calcular_media_geral, para que os resultados sejam idênticos aos da tela.
+        Retorna um dicionário com:
+        'nota' {pk_id: média da disciplina}, 'aluno' {aluno_id: média geral},
+        'turma' {turma: média das médias gerais}, 'disciplina' {disciplina: média entre os alunos}.
+        """
+        medias_nota = (politica or MediaSimples()).calcular_lote(self)
+
+        somas, contagens = somar_por_grupo(self.nota_aluno, medias_nota, len(self.alunos))
+        medias_aluno = array('q', [dividir_arredondado(somas[i], contagens[i]) for i in range(len(self.alunos))])
+
+        somas_t, contagens_t = somar_por_grupo(self.aluno_turma, medias_aluno, len(self.turmas))
+        somas_d, contagens_d = somar_por_grupo(self.nota_disciplina, medias_nota, len(self.disciplinas))
+        return {
+            'nota': dict(zip(self.nota_pk, medias_nota)),
+            'aluno': dict(zip(self.alunos, medias_aluno)),
+            'turma': {t: dividir_arredondado(somas_t[i], contagens_t[i]) for i, t in enumerate(self.turmas)},
+            'disciplina': {d: dividir_arredondado(somas_d[i], contagens_d[i]) for i, d in enumerate(self.disciplinas)},
+        }
+
+    def notas_necessarias(self, politica=None, corte=MEDIA_APROVACAO):
+        """
+        Nota necessária (PoliticaMedia.nota_necessaria) de cada disciplina com componente
+        em 0,0, numa passada pelos vetores de componentes. corte pode ser uma função
+        corte(disciplina), para disciplinas com média de aprovação própria.
+        Retorna {pk_id: (média atual, quantidade de pendentes, nota necessária)}.
+        """
+        politica = politica or MediaSimples()
+        corte_da = corte if callable(corte) else lambda disciplina: corte
+        resultado = {}
+        fim = len(self.comp_nota)
+        inicio = 0
+        while inicio < fim:  # Os componentes de uma disciplina são contíguos (ORDER BY pk_id)
+            nota = self.comp_nota[inicio]
+            final = inicio
+            while final < fim and self.comp_nota[final] == nota:
+                final += 1
+            valores = self.comp_valor[inicio:final]
+            if 0 in valores:
+                notas, pesos = list(valores), list(self.comp_peso[inicio:final])
+                corte_nota = corte_da(self.disciplinas[self.nota_disciplina[nota]])
+                resultado[self.nota_pk[nota]] = (politica.calcular(notas, pesos), notas.count(0),
+                                                 politica.nota_necessaria(notas, pesos, corte_nota))
+            inicio = final
+        return resultado
+
+class EscritorSQLite(threading.Thread):
+    """
+    Thread com conexão própria que executa, em fila, todas as gravações do app.
+    Cada item da fila é uma função operacao(cur, *args) rodada numa transação.
+    """
+    def __init__(self, caminho):
+        super().__init__(name="EscritorSQLite", daemon=True)
+        self.caminho = caminho
+        self.fila = queue.Queue()
+
+    def submeter(self, operacao, *args):
+        """ Enfileira a operação e retorna um Future com o seu resultado. """
+        futuro = Future()
+        self.fila.put((operacao, args, futuro))
+        return futuro
+
+    def parar(self):
+        self.fila.put(None)
+        self.join()
+
+    def run(self):
+        conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        cur = conexao.cursor()
+        while True:
+            tarefa = self.fila.get()
+            if tarefa is None:
+                break
+            operacao, args, futuro = tarefa
+            if not futuro.set_running_or_notify_cancel():
+                continue
+            try:
+                resultado = executar_em_transacao(cur, operacao, *args)
+            except BaseException as e:
+                futuro.set_exception(e)
+            else:
+                futuro.set_result(resultado)
+        conexao.close()
+
+def executar_em_transacao(cur, operacao, *args):
+    """ operacao(cur, *args) numa transação (conexão em modo autocommit, isolation_level=None). """
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        resultado = operacao(cur, *args)
+        cur.execute("COMMIT")
+    except BaseException:
+        if cur.connection.in_transaction:
+            cur.execute("ROLLBACK")
+        raise
+    return resultado
+
+class TarefaCancelada(Exception):
+    """ Levantada por Tarefa.progresso depois que o usuário cancelou a tarefa. """
+
+class Tarefa(Future):
+    """
+    Future de uma operação do ExecutorTarefas, com progresso e cancelamento cooperativo:
+    a operação chama progresso(feitos, total) de tempos em tempos, o que levanta
+    TarefaCancelada depois de cancelar(). total None = quantidade desconhecida.
+    """
+    def __init__(self, descricao=""):
+        super().__init__()
+        self.descricao = descricao
+        self.feitos = 0
+        self.total = None
+        self.cancelamento = threading.Event()
+
+    def progresso(self, feitos, total=None):
+        if self.cancelamento.is_set():
+            raise TarefaCancelada(self.descricao)
+        self.feitos, self.total = feitos, total
+
+    def cancelar(self):
+        """ Cancela já se a tarefa ainda está na fila; senão, no próximo progresso(). """
+        self.cancelamento.set()
+        self.cancel()
+
+    @property
+    def cancelada(self):
+        return self.cancelamento.is_set()
+
+class ExecutorTarefas(threading.Thread):
+    """
+    Thread de trabalho para leituras demoradas do banco e para arquivos, para a janela
+    não travar. Cada tarefa roda operacao(cur, tarefa, *args) com a conexão própria desta
+    thread (modo autocommit: a operação abre as transações de que precisar); as gravações
+    do app continuam no EscritorSQLite. A thread do Tk acompanha a Tarefa com root.after.
+    """
+    def __init__(self, caminho):
+        super().__init__(name="ExecutorTarefas", daemon=True)
+        self.caminho = caminho
+        self.fila = queue.Queue()
+
+    def submeter(self, operacao, *args, descricao=""):
+        """ Enfileira a operação e retorna a Tarefa. """
+        tarefa = Tarefa(descricao)
+        self.fila.put((operacao, args, tarefa))
+        return tarefa
+
+    def parar(self):
+        self.fila.put(None)
+        self.join()
+
+    def run(self):
+        conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+        cur = conexao.cursor()
+        while True:
+            item = self.fila.get()
+            if item is None:
+                break
+            operacao, args, tarefa = item
+            if not tarefa.set_running_or_notify_cancel():
+                continue
+            try:
+                resultado = operacao(cur, tarefa, *args)
+            except BaseException as e:
+                tarefa.set_exception(e)
+            else:
+                tarefa.set_result(resultado)
+            finally:
+                if conexao.in_transaction:
+                    cur.execute("ROLLBACK")
+        conexao.close()
+
+class ReconciliadorTreeview:
+    """
+    Atualiza uma Treeview por chave em vez de apagar e reinserir todas as linhas:
+    reconciliar() só insere, altera, move ou remove as linhas que mudaram, então
+    seleção e rolagem das linhas que continuam são mantidas. Guarda os valores
+    exibidos em Python (a Treeview devolve "1" como 1 e "0,0" como texto).
+    Em reconciliar(), uma chave repetida vira (chave, 2), (chave, 3)...
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.iids = {}     # chave -> iid
+        self.chaves = {}   # iid -> chave
+        self.valores = {}  # chave -> valores exibidos
+
+    def __contains__(self, chave):
+        return chave in self.iids
+
+    def __len__(self):
+        return len(self.iids)
+
+    def definir(self, chave, valores, indice="end"):
+        """ Insere ou altera uma única linha. """
+        valores = tuple(valores)
+        iid = self.iids.get(chave)
+        if iid is None:
+            iid = self.tree.insert("", indice, values=valores)
+            self.iids[chave] = iid
+            self.chaves[iid] = chave
+        elif self.valores[chave] != valores:
+            self.tree.item(iid, values=valores)
+        self.valores[chave] = valores
+
+    def remover(self, chave):
+        iid = self.iids.pop(chave, None)
+        if iid is not None:
+            del self.chaves[iid]
+            del self.valores[chave]
+            self.tree.delete(iid)
+
+    def reconciliar(self, linhas):
+        """ Deixa a Treeview com linhas [(chave, valores)], nesta ordem. """
+        novas = {}
+        for chave, valores in linhas:
+            unica, ocorrencia = chave, 1
+            while unica in novas:
+                ocorrencia += 1
+                unica = (chave, ocorrencia)
+            novas[unica] = tuple(valores)
+        removidas = [chave for chave in self.iids if chave not in novas]
+        if removidas:
+            self.tree.delete(*[self.iids[chave] for chave in removidas])
+            for chave in removidas:
+                del self.chaves[self.iids.pop(chave)]
+                del self.valores[chave]
+        ordem = [self.chaves[iid] for iid in self.tree.get_children()]
+        for indice, (chave, valores) in enumerate(novas.items()):
+            if chave not in self.iids:
+                ordem.insert(indice, chave)
+            elif ordem[indice] != chave:
+                self.tree.move(self.iids[chave], "", indice)
+                ordem.remove(chave)
+                ordem.insert(indice, chave)
+            self.definir(chave, valores, indice)
+
+    def linhas(self):
+        """ [(chave, valores)] na ordem em que aparecem. """
+        return [(self.chaves[iid], self.valores[self.chaves[iid]]) for iid in self.tree.get_children()]
+
+    def chave_selecionada(self):
+        selecao = self.tree.selection()
+        return self.chaves.get(selecao[0]) if selecao else None
+
+class ListaVirtual:
+    """
+    Treeview que só materializa as linhas que cabem na tela. Mantém um conjunto fixo
+    de linhas e, ao rolar, troca apenas os valores delas com o trecho visível, buscado
+    em pagina(inicio, quantidade) por páginas de TAMANHO_PAGINA_LISTA (as últimas
+    ficam em cache). total() informa a quantidade de registros para a barra de rolagem.
+    A seleção é guardada pela chave do registro (valor na coluna coluna_chave),
+    já que a mesma linha da Treeview mostra registros diferentes conforme a rolagem.
+    """
+    def __init__(self, parent, colunas, titulos, total, pagina, coluna_chave=0):
+        self.total = total
+        self.pagina = pagina
+        self.coluna_chave = coluna_chave
+        self.paginas = CacheLRU(8)
+        self.inicio = 0       # índice do primeiro registro visível
+        self.visiveis = 1     # linhas que cabem na Treeview
+        self.linhas = []      # iids das linhas materializadas, de cima para baixo
+        self.exibidos = {}    # iid -> registro exibido (só linhas que mudaram são reescritas)
+        self.selecionado = None
+
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=colunas, show='headings', selectmode='browse')
+        for coluna, titulo in zip(colunas, titulos):
+            self.tree.heading(coluna, text=titulo)
+        self.barra = ttk.Scrollbar(self.frame, orient='vertical', command=self.rolar)
+        self.barra.pack(side='right', fill='y')
+        self.tree.pack(side='left', expand=True, fill='both')
+
+        self.tree.bind("<Configure>", self.redimensionar)
+        self.tree.bind("<<TreeviewSelect>>", self.ao_selecionar)
+        self.tree.bind("<MouseWheel>", lambda e: self.rolar("scroll", -1 if e.delta > 0 else 1, "units") or "break")
+        self.tree.bind("<Button-4>", lambda e: self.rolar("scroll", -1, "units") or "break")
+        self.tree.bind("<Button-5>", lambda e: self.rolar("scroll", 1, "units") or "break")
+        self.tree.bind("<Up>", lambda e: self.mover(-1) or "break")
+        self.tree.bind("<Down>", lambda e: self.mover(1) or "break")
+        self.tree.bind("<Prior>", lambda e: self.mover(-self.visiveis) or "break")
+        self.tree.bind("<Next>", lambda e: self.mover(self.visiveis) or "break")
+        self.tree.bind("<Home>", lambda e: self.mover(-self.total()) or "break")
+        self.tree.bind("<End>", lambda e: self.mover(self.total()) or "break")
+
+    def pack(self, **opcoes):
+        self.frame.pack(**opcoes)
+
+    def atualizar(self, a_partir_de=0):
+        """
+        Descarta as páginas em cache a partir do registro a_partir_de (o que mudou)
+        e redesenha; as linhas visíveis com os mesmos valores não são reescritas.
+        """
+        for numero in [n for n in self.paginas.dados if (n + 1) * TAMANHO_PAGINA_LISTA > a_partir_de]:
+            self.paginas.pop(numero)
+        self.desenhar()
+
+    def registros(self, inicio, quantidade):
+        """ Registros [inicio, inicio + quantidade), montados a partir das páginas em cache. """
+        resultado = []
+        numero = inicio // TAMANHO_PAGINA_LISTA
+        while len(resultado) < quantidade:
+            pagina = self.paginas.get(numero)
+            if pagina is None:
+                pagina = self.pagina(numero * TAMANHO_PAGINA_LISTA, TAMANHO_PAGINA_LISTA)
+                self.paginas[numero] = pagina
+            deslocamento = max(0, inicio - numero * TAMANHO_PAGINA_LISTA)
+            resultado.extend(pagina[deslocamento:deslocamento + quantidade - len(resultado)])
+            if len(pagina) < TAMANHO_PAGINA_LISTA:
+                break
+            numero += 1
+        return resultado
+
+    def desenhar(self):
+        total = self.total()
+        self.inicio = max(0, min(self.inicio, total - self.visiveis))
+        valores = self.registros(self.inicio, self.visiveis) if total else []
+        while len(self.linhas) < len(valores):
+            self.linhas.append(self.tree.insert("", "end"))
+        while len(self.linhas) > len(valores):
+            iid = self.linhas.pop()
+            self.exibidos.pop(iid, None)
+            self.tree.delete(iid)
+        linha_selecionada = None
+        for iid, registro in zip(self.linhas, valores):
+            if self.exibidos.get(iid) != registro:
+                self.tree.item(iid, values=registro)
+                self.exibidos[iid] = registro
+            if registro[self.coluna_chave] == self.selecionado:
+                linha_selecionada = iid
+        if linha_selecionada:
+            self.tree.selection_set(linha_selecionada)
+            self.tree.focus(linha_selecionada)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+        if total:
+            self.barra.set(self.inicio / total, min(1.0, (self.inicio + self.visiveis) / total))
+        else:
+            self.barra.set(0.0, 1.0)
+
+    def redimensionar(self, event):
+        """ Recalcula quantas linhas cabem, medindo cabeçalho e altura de linha pela primeira linha. """
+        caixa = self.tree.bbox(self.linhas[0]) if self.linhas else None
+        if caixa:
+            cabecalho, altura = caixa[1], caixa[3]
+        else:
+            altura = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+            cabecalho = altura
+        visiveis = max(1, (event.height - cabecalho) // altura)
+        if visiveis != self.visiveis or not self.linhas:
+            self.visiveis = visiveis
+            self.desenhar()
+
+    def rolar(self, acao, quantidade, unidade=None):
+        """ Comando da barra de rolagem: ("moveto", fração) ou ("scroll", n, "units"|"pages"). """
+        if acao == "moveto":
+            self.inicio = int(float(quantidade) * self.total())
+        elif unidade == "pages":
+            self.inicio += int(quantidade) * self.visiveis
+        else:
+            self.inicio += int(quantidade)
+        self.desenhar()
+
+    def ao_selecionar(self, event=None):
+        selecao = self.tree.selection()
+        if selecao and selecao[0] in self.exibidos:
+            self.selecionado = self.exibidos[selecao[0]][self.coluna_chave]
+
+    def mover(self, passos):
+        """ Move a seleção pelo teclado, rolando para mantê-la visível. """
+        total = self.total()
+        if not total:
+            return
+        selecao = self.tree.selection()
+        if selecao and selecao[0] in self.linhas:
+            indice = self.inicio + self.linhas.index(selecao[0]) + passos
+        else:
+            indice = self.inicio
+        indice = max(0, min(indice, total - 1))
+        if indice < self.inicio:
+            self.inicio = indice
+        elif indice >= self.inicio + self.visiveis:
+            self.inicio = indice - self.visiveis + 1
+        self.selecionado = self.registros(indice, 1)[0][self.coluna_chave]
+        self.desenhar()
+
+class GradeNotas:
+    """
+    Planilha de lançamento: uma linha por aluno, uma coluna por componente, cada célula um ttk.Entry.
+    Setas, Enter e Tab andam entre as células; colar (Ctrl+V) um bloco copiado de uma planilha
+    preenche a partir da célula atual. Cada célula é conferida com validar(texto), que levanta
+    ValueError para valores inválidos; as inválidas ficam em invalidas e recebem estilo_invalido.
+    Células vazias são aceitas. Com pesos=True, uma linha de pesos fica abaixo do cabeçalho.
+    alteradas() e pesos_alterados() dizem o que mudou desde guardar_originais().
+    """
+    def __init__(self, parent, rotulos, colunas, validar, estilo_invalido, fundo, pesos=False):
+        self.validar = validar
+        self.estilo_invalido = estilo_invalido
+        self.invalidas = set()
+        self.originais = []
+        self.pesos_originais = []
+
+        self.frame = ttk.Frame(parent)
+        self.canvas = tk.Canvas(self.frame, highlightthickness=0, bg=fundo)
+        barra_v = ttk.Scrollbar(self.frame, orient='vertical', command=self.canvas.yview)
+        barra_h = ttk.Scrollbar(self.frame, orient='horizontal', command=self.canvas.xview)
+        self.canvas.configure(yscrollcommand=barra_v.set, xscrollcommand=barra_h.set)
+        barra_v.pack(side='right', fill='y')
+        barra_h.pack(side='bottom', fill='x')
+        self.canvas.pack(side='left', expand=True, fill='both')
+        self.interior = ttk.Frame(self.canvas, style="Content.TFrame")
+        self.canvas.create_window((0, 0), window=self.interior, anchor='nw')
+        self.interior.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+
+        ttk.Label(self.interior, text="Aluno", font=('Inter', 10, 'bold')).grid(row=0, column=0, sticky='w', padx=5)
+        for j, coluna in enumerate(colunas, 1):
+            ttk.Label(self.interior, text=coluna, font=('Inter', 10, 'bold')).grid(row=0, column=j, padx=2)
+        self.pesos = []
+        if pesos:
+            ttk.Label(self.interior, text="Peso (1-5)").grid(row=1, column=0, sticky='w', padx=5)
+            for j in range(len(colunas)):
+                entry = ttk.Entry(self.interior, width=8, justify='center')
+                entry.insert(0, "1")
+                entry.grid(row=1, column=j + 1, padx=2, pady=(0, 6))
+                self.pesos.append(entry)
+
+        self.celulas = []
+        for i, rotulo in enumerate(rotulos):
+            ttk.Label(self.interior, text=rotulo).grid(row=i + 2, column=0, sticky='w', padx=5)
+            linha = []
+            for j in range(len(colunas)):
+                entry = ttk.Entry(self.interior, width=8, justify='center')
+                entry.grid(row=i + 2, column=j + 1, padx=2, pady=1)
+                self.ligar_teclas(entry, i, j)
+                linha.append(entry)
+            self.celulas.append(linha)
+
+    def pack(self, **opcoes):
+        self.frame.pack(**opcoes)
+
+    def ligar_teclas(self, entry, i, j):
+        entry.bind("<Up>", lambda e: self.mover(i - 1, j) or "break")
+        entry.bind("<Down>", lambda e: self.mover(i + 1, j) or "break")
+        entry.bind("<Return>", lambda e: self.mover(i + 1, j) or "break")
+        entry.bind("<KP_Enter>", lambda e: self.mover(i + 1, j) or "break")
+        entry.bind("<Shift-Return>", lambda e: self.mover(i - 1, j) or "break")
+        entry.bind("<Tab>", lambda e: self.mover_em_ordem(i, j, 1) or "break")
+        entry.bind("<Shift-Tab>", lambda e: self.mover_em_ordem(i, j, -1) or "break")
+        entry.bind("<ISO_Left_Tab>", lambda e: self.mover_em_ordem(i, j, -1) or "break")
+        entry.bind("<Left>", lambda e: self.sair_pela_borda(entry, i, j, -1))
+        entry.bind("<Right>", lambda e: self.sair_pela_borda(entry, i, j, 1))
+        entry.bind("<<Paste>>", lambda e: self.colar(i, j))
+        entry.bind("<FocusOut>", lambda e: self.conferir(i, j))
+        entry.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+        entry.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
+        entry.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
+
+    def sair_pela_borda(self, entry, i, j, passo):
+        """ Esquerda/direita só saem da célula com o cursor na borda do texto, como numa planilha. """
+        posicao = entry.index(tk.INSERT)
+        if (passo < 0 and posicao == 0) or (passo > 0 and posicao == len(entry.get())):
+            self.mover(i, j + passo)
+            return "break"
+        return None
+
+    def valor(self, i, j):
+        return self.celulas[i][j].get()
+
+    def linha(self, i):
+        return [entry.get() for entry in self.celulas[i]]
+
+    def definir(self, i, j, texto):
+        entry = self.celulas[i][j]
+        entry.delete(0, tk.END)
+        entry.insert(0, texto)
+        self.conferir(i, j)
+
+    def guardar_originais(self):
+        """ Guarda os textos atuais (os carregados do banco) como ponto de partida de alteradas(). """
+        self.originais = [[texto.strip() for texto in self.linha(i)] for i in range(len(self.celulas))]
+        self.pesos_originais = [entry.get().strip() for entry in self.pesos]
+
+    def alteradas(self, i):
+        """ {coluna: texto} das células da linha i que mudaram desde guardar_originais(). """
+        return {j: texto for j, texto in enumerate(self.linha(i)) if texto.strip() != self.originais[i][j]}
+
+    def pesos_alterados(self):
+        """ {coluna: texto} dos pesos que mudaram desde guardar_originais(). """
+        return {j: entry.get() for j, entry in enumerate(self.pesos) if entry.get().strip() != self.pesos_originais[j]}
+
+    def conferir(self, i, j):
+        """ Valida a célula e marca/desmarca como inválida; retorna True se ela estiver ok. """
+        texto = self.valor(i, j).strip()
+        try:
+            if texto:
+                self.validar(texto)
+        except ValueError:
+            self.invalidas.add((i, j))
+            self.celulas[i][j].configure(style=self.estilo_invalido)
+            return False
+        if (i, j) in self.invalidas:
+            self.invalidas.discard((i, j))
+            self.celulas[i][j].configure(style="TEntry")
+        return True
+
+    def primeira_invalida(self):
+        return min(self.invalidas) if self.invalidas else None
+
+    def mover(self, i, j):
+        """ Leva o foco para a célula (i, j), limitada à grade, e rola até ela. """
+        if not self.celulas:
+            return
+        i = max(0, min(i, len(self.celulas) - 1))
+        j = max(0, min(j, len(self.celulas[i]) - 1))
+        entry = self.celulas[i][j]
+        entry.focus_set()
+        entry.select_range(0, tk.END)
+        entry.icursor(tk.END)
+        self.mostrar(entry)
+
+    def mover_em_ordem(self, i, j, passo):
+        """ Tab: próxima célula da linha, passando para a linha seguinte no fim. """
+        largura = len(self.celulas[i])
+        posicao = i * largura + j + passo
+        if 0 <= posicao < len(self.celulas) * largura:
+            self.mover(*divmod(posicao, largura))
+
+    def mostrar(self, entry):
+        self.interior.update_idletasks()
+        altura = self.interior.winfo_height()
+        if altura <= 0:
+            return
+        topo, fim = entry.winfo_y(), entry.winfo_y() + entry.winfo_height()
+        inicio, visivel = self.canvas.canvasy(0), self.canvas.winfo_height()
+        if topo < inicio:
+            self.canvas.yview_moveto(topo / altura)
+        elif fim > inicio + visivel:
+            self.canvas.yview_moveto((fim - visivel) / altura)
+
+    def colar(self, i, j):
+        """
+        Cola um bloco vindo de uma planilha a partir da célula (i, j); o que passa das bordas
+        da grade é descartado. Um valor único segue a colagem normal do Entry.
+        """
+        try:
+            texto = self.frame.clipboard_get()
+        except tk.TclError:
+            return "break"
+        tabela = ler_tabela_colada(texto)
+        if len(tabela) == 1 and len(tabela[0]) == 1:
+            return None
+        for di, valores in enumerate(tabela):
+            if i + di >= len(self.celulas):
+                break
+            for dj, valor in enumerate(valores):
+                if j + dj >= len(self.celulas[i + di]):
+                    break
+                self.definir(i + di, j + dj, valor.strip())
+        self.mover(min(i + len(tabela), len(self.celulas)) - 1, j)
+        return "break"
+
 class GerenciadorNotasApp:
     """
     ENOTE - Sistema de Notas Escolares (sem pesos, com componentes padrão)
+    Com janela=False monta só a parte de dados, sem tema nem menu: root pode ser um
+    tkinter.Tcl(), que continua entregando as tarefas em segundo plano (root.after).
     """
-    def __init__(self, root):
+    def __init__(self, root, caminho_banco=CAMINHO_BANCO, janela=True):
         self.root = root
-        self.root.title("ENOTE - SISTEMA DE NOTAS ESCOLARES (SEM PESO)")
-        self.root.geometry("1000x750")
-        self.root.minsize(900, 650)
+        self.janela = janela
+        if janela:
+            self.root.title("ENOTE - SISTEMA DE NOTAS ESCOLARES (SEM PESO)")
+            self.root.geometry("1000x750")
+            self.root.minsize(900, 650)
 
         # --- Conexão com Banco ---
+        self.caminho_banco = caminho_banco
+        self.escritor = None
+        self.executor = None
+        self.tarefas = []  # Acompanhadas por verificar_tarefas (root.after)
+        self.verificando_tarefas = False
+        self.politica_media = MediaSimples()  # Substituídas pelas salvas em config (carregar_criterios)
+        self.regras_situacao = RegrasSituacao()
         try:
-            self.conexao = sqlite3.connect("banco_completo.db")
+            self.conexao = sqlite3.connect(caminho_banco)
             self.cursor = self.conexao.cursor()
-            self.criar_tabelas()
+            self.criar_tabelas(progresso=self.atualizar_progresso_migracao if janela else None)
+            if getattr(self, 'janela_migracao', None):
+                self.janela_migracao.destroy()
+                self.janela_migracao = None
+            if USAR_ESCRITOR_WAL:
+                self.cursor.execute("PRAGMA journal_mode=WAL")
+                self.escritor = EscritorSQLite(caminho_banco)
+                self.escritor.start()
+            else:
+                self.cursor.execute("PRAGMA journal_mode=DELETE")
+            self.executor = ExecutorTarefas(caminho_banco)
+            self.executor.start()
         except sqlite3.Error as e:
+            if not janela:
+                raise
             messagebox.showerror("Erro de Banco de Dados", f"Não foi possível conectar ao SQLite: {e}")
             self.root.quit()
             return
 
         self.alunos = {}
-        self.notas = {}
+        self.ordem_alunos = []  # Ordem da lista de alunos do menu (atualizar_lista_alunos)
+        self.busca = None  # IndiceBusca, montado na primeira busca (indice_busca)
+        self.alunos_sem_busca = None  # Incluídos enquanto o IndiceBusca é montado em segundo plano
+        self.ao_montar_busca = None
+        self.carregando_alunos = False
+        self.resultado_busca = None  # Alunos exibidos quando há texto na busca do menu
+        self.notas = CacheLRU(TAMANHO_CACHE_NOTAS)
+        self.memo_medias = MemoMedias(TAMANHO_CACHE_NOTAS)
+        self.rankings = {}
+        self.nivel_transacao = 0
         self.prof_password = None
-        self.carregar_dados()
         self.carregar_config()
+        self.carregar_dados_em_segundo_plano()
+        if not janela:
+            return
 
         # --- Tema Dark ---
         self.BG_MAIN = '#0a0a0a'
@@ -75,6 +1662,9 @@ class GerenciadorNotasApp:
         self.style.map("Success.TButton",
                        background=[('active', '#3c9e5b'), ('pressed', '#1e8449')])
 
+        # Célula inválida da grade de notas da turma
+        self.style.configure("Invalida.TEntry", fieldbackground='#f5b7b1')
+
 
         self.current_frame = None
         self.show_main_menu()
@@ -82,7 +1672,21 @@ class GerenciadorNotasApp:
     # ======================================================
     # BANCO DE DADOS
     # ======================================================
-    def criar_tabelas(self):
+    # Versões do esquema (PRAGMA user_version). Cada passo leva o banco da versão
+    # anterior para a indicada e pode ser repetido sem efeito se já tiver sido aplicado.
+    MIGRACOES = (
+        (1, "Ajustando tabela de notas (ENOTE 4.0/4.1)", "migracao_pk_id"),
+        (2, "Convertendo componentes de nota", "migracao_componentes"),
+        (3, "Adicionando controle de revisões", "migracao_revisoes"),
+        (4, "Criando índices", "migracao_indices"),
+        (5, "Adicionando colunas de médias", "migracao_medias"),
+        (6, "Adicionando colunas de situação", "migracao_situacao"),
+        (7, "Calculando médias", "migracao_centesimos"),
+    )
+    VERSAO_SCHEMA = MIGRACOES[-1][0]
+    TAMANHO_LOTE_MIGRACAO = 5000
+
+    def criar_tabelas(self, progresso=None):
         self.cursor.execute("""
         CREATE TABLE IF NOT EXISTS alunos (
             id TEXT PRIMARY KEY,
@@ -90,7 +1694,10 @@ class GerenciadorNotasApp:
             matricula TEXT,
             data_nascimento TEXT,
             turma TEXT NOT NULL,
-            contato TEXT
+            contato TEXT,
+            rev INTEGER NOT NULL DEFAULT 0,
+            media INTEGER,
+            situacao TEXT
         )
         """)
         self.cursor.execute("""
@@ -99,16 +1706,159 @@ class GerenciadorNotasApp:
             aluno_id TEXT NOT NULL,
             disciplina TEXT NOT NULL,
             componentes TEXT NOT NULL,
+            rev INTEGER NOT NULL DEFAULT 0,
+            media INTEGER,
+            situacao TEXT,
             FOREIGN KEY (aluno_id) REFERENCES alunos(id) ON DELETE CASCADE
         )
         """)
         self.cursor.execute("""
+        CREATE TABLE IF NOT EXISTS componentes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nota_pk INTEGER NOT NULL,
+            nome TEXT NOT NULL,
+            nota INTEGER NOT NULL DEFAULT 0,
+            peso INTEGER NOT NULL DEFAULT 1,
+            ordem INTEGER NOT NULL,
+            FOREIGN KEY (nota_pk) REFERENCES notas(pk_id) ON DELETE CASCADE
+        )
+        """)
+        self.cursor.execute("""
         CREATE TABLE IF NOT EXISTS config (
             chave TEXT PRIMARY KEY,
             valor TEXT
         )
         """)
         self.conexao.commit()
+        self.migrar_banco(progresso)
+
+    # ======================================================
+    # MIGRAÇÕES DE ESQUEMA
+    # ======================================================
+    def migrar_banco(self, progresso=None):
+        """
+        Aplica as MIGRACOES pendentes segundo PRAGMA user_version.
+        progresso(descricao, feitos, total) é chamado a cada lote gravado.
+        """
+        self.cursor.execute("PRAGMA user_version")
+        versao = self.cursor.fetchone()[0]
+        if versao > self.VERSAO_SCHEMA:
+            raise sqlite3.DatabaseError(
+                f"O banco está na versão {versao} do esquema, mais nova que a suportada ({self.VERSAO_SCHEMA}). "
+                "Atualize o ENOTE.")
+
+        for nova_versao, descricao, metodo in self.MIGRACOES:
+            if nova_versao <= versao:
+                continue
+            getattr(self, metodo)(partial(progresso, descricao) if progresso else None)
+            self.cursor.execute(f"PRAGMA user_version = {nova_versao}")
+            self.conexao.commit()
+
+    def migracao_pk_id(self, progresso):
+        """ ENOTE 4.0 e 4.1 chamavam a chave de notas de 'id'; a partir do 4.2 é 'pk_id'. """
+        if not self.coluna_existe("notas", "pk_id") and self.coluna_existe("notas", "id"):
+            self.cursor.execute("ALTER TABLE notas RENAME COLUMN id TO pk_id")
+
+    def migracao_componentes(self, progresso):
+        """
+        Move os componentes gravados como JSON em notas.componentes para a tabela
+        componentes, em lotes (um commit por lote). O peso dos componentes do 3.x/4.0
+        é preservado. A linha migrada fica com '[]', então uma migração
+        interrompida continua de onde parou. Uma linha com JSON ilegível é
+        deixada como está (e informada em stderr), nunca apagada.
+        """
+        self.adicionar_coluna_se_faltar("componentes", "peso", "INTEGER NOT NULL DEFAULT 1")
+        self.cursor.execute("SELECT COUNT(*) FROM notas WHERE componentes != '[]'")
+        total = self.cursor.fetchone()[0]
+        feitos, ultimo_pk = 0, 0
+        while True:
+            self.cursor.execute("""
+                SELECT pk_id, componentes FROM notas
+                WHERE pk_id > ? AND componentes != '[]'
+                ORDER BY pk_id LIMIT ?
+            """, (ultimo_pk, self.TAMANHO_LOTE_MIGRACAO))
+            lote = self.cursor.fetchall()
+            if not lote:
+                break
+            migrados = []
+            for pk_id, comp_json in lote:
+                try:
+                    comps = [Componente(c['nome'], round(float(c.get('nota', 0)) * ESCALA_NOTA), round(float(c.get('peso', 1))))
+                             for c in json.loads(comp_json)]
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    print(f"Notas {pk_id} não convertidas (componentes ilegíveis: {e}); o texto original foi mantido.",
+                          file=sys.stderr)
+                    continue
+                self.cursor.execute("DELETE FROM componentes WHERE nota_pk = ?", (pk_id,))
+                self.salvar_componentes(self.cursor, pk_id, comps)
+                migrados.append((pk_id,))
+            # A coluna antiga é NOT NULL; fica com a lista vazia para marcar a linha como migrada
+            self.cursor.executemany("UPDATE notas SET componentes = '[]' WHERE pk_id = ?", migrados)
+            self.conexao.commit()
+            ultimo_pk = lote[-1][0]
+            feitos += len(lote)
+            if progresso: progresso(feitos, total)
+
+    def migracao_revisoes(self, progresso):
+        """ Coluna rev e contador global usados pela sincronização incremental. """
+        self.adicionar_coluna_se_faltar("alunos", "rev", "INTEGER NOT NULL DEFAULT 0")
+        self.adicionar_coluna_se_faltar("notas", "rev", "INTEGER NOT NULL DEFAULT 0")
+        self.cursor.execute("INSERT OR IGNORE INTO config VALUES ('rev', '0')")
+
+    def migracao_indices(self, progresso, versao=4):
+        """ Cria os INDICES introduzidos na versão indicada do esquema. """
+        novos = [(nome, alvo) for nome, (alvo, v) in INDICES.items() if v == versao]
+        for i, (nome, alvo) in enumerate(novos, start=1):
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON {alvo}")
+            if progresso: progresso(i, len(novos))
+
+    def migracao_medias(self, progresso):
+        """ Colunas media em notas (por disciplina) e alunos (geral), preenchidas em migracao_centesimos. """
+        self.adicionar_coluna_se_faltar("notas", "media", "INTEGER")
+        self.adicionar_coluna_se_faltar("alunos", "media", "INTEGER")
+
+    def migracao_situacao(self, progresso):
+        """ Colunas situacao ao lado de media, preenchidas em migracao_centesimos. """
+        self.adicionar_coluna_se_faltar("notas", "situacao", "TEXT")
+        self.adicionar_coluna_se_faltar("alunos", "situacao", "TEXT")
+
+    def migracao_centesimos(self, progresso):
+        """
+        Preenche médias e situações (notas e alunos) com as mesmas funções usadas na tela,
+        para que os valores gravados sejam idênticos; os índices sobre elas só são criados
+        no fim, para não pesar na carga. As notas já chegam em centésimos de migracao_componentes.
+        """
+        self.carregar_criterios()
+        self.recalcular_medias_gravadas(self.executar_na_migracao, progresso)
+        self.migracao_indices(None, versao=5)
+
+    def executar_na_migracao(self, operacao, *args):
+        """ Roda uma operação de gravação na conexão principal e confirma (um commit por lote). """
+        resultado = operacao(self.cursor, *args)
+        self.conexao.commit()
+        return resultado
+
+    def coluna_existe(self, tabela, coluna):
+        self.cursor.execute(f"PRAGMA table_info({tabela})")
+        return coluna in [row[1] for row in self.cursor.fetchall()]
+
+    def adicionar_coluna_se_faltar(self, tabela, coluna, definicao):
+        if not self.coluna_existe(tabela, coluna):
+            self.cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+
+    def atualizar_progresso_migracao(self, descricao, feitos, total):
+        """ Janela simples de progresso exibida enquanto um banco antigo é atualizado. """
+        if not getattr(self, 'janela_migracao', None):
+            self.janela_migracao = tk.Toplevel(self.root)
+            self.janela_migracao.title("Atualizando banco de dados")
+            self.janela_migracao.geometry("420x110")
+            self.label_migracao = ttk.Label(self.janela_migracao)
+            self.label_migracao.pack(pady=10)
+            self.barra_migracao = ttk.Progressbar(self.janela_migracao, length=360, mode='determinate')
+            self.barra_migracao.pack(pady=5)
+        self.label_migracao.config(text=f"{descricao}... {feitos}/{total}")
+        self.barra_migracao.config(maximum=max(total, 1), value=feitos)
+        self.root.update()
 
     def carregar_config(self):
         self.cursor.execute("SELECT valor FROM config WHERE chave = 'prof_password'")
@@ -117,34 +1867,735 @@ class GerenciadorNotasApp:
             self.prof_password = row[0]
         else:
             self.prof_password = "ADMIN"
-            self.cursor.execute("INSERT OR REPLACE INTO config VALUES (?, ?)",
-                                 ('prof_password', self.prof_password))
-            self.conexao.commit()
+            self.salvar_config('prof_password', self.prof_password)
 
-    def salvar_senha_professor(self, nova):
-        self.prof_password = nova
-        self.cursor.execute("INSERT OR REPLACE INTO config VALUES (?, ?)",
-                            ('prof_password', nova))
-        self.conexao.commit()
+        self.carregar_criterios()
+
+    def carregar_criterios(self):
+        """ Política de média e regras de situação gravadas em config. """
+        self.cursor.execute("SELECT valor FROM config WHERE chave = 'politica_media'")
+        row = self.cursor.fetchone()
+        self.politica_media = criar_politica_media(row[0] if row else None)
+        self.cursor.execute("SELECT valor FROM config WHERE chave = 'regras_situacao'")
+        row = self.cursor.fetchone()
+        self.regras_situacao = RegrasSituacao.de_json(row[0]) if row else RegrasSituacao()
 
-    def carregar_dados(self):
+    def salvar_senha_professor(self, nova, ao_concluir=None):
+        self.prof_password = nova
+        self.salvar_config('prof_password', nova, ao_concluir)
+
+    def armazem_colunar(self, turma=None, cur=None, tarefa=None):
+        """ ArmazemColunar com as notas da turma (ou da escola, se turma for None). """
+        return ArmazemColunar.carregar(cur or self.conexao.cursor(), turma, tarefa)
+
+    def estatisticas_notas(self, turma=None, cur=None, tarefa=None):
+        """
+        Estatísticas das médias por disciplina gravadas (notas.media), por turma e disciplina:
+        {(turma, disciplina): EstatisticaStreaming}, None = todas (ver estatisticas_por_grupo).
+        As linhas vêm direto do cursor, sem passar por self.notas.
+        """
+        cur = cur or self.conexao.cursor()
+        if turma is None:
+            cur.execute("""
+                SELECT a.turma, n.disciplina, n.media FROM alunos a JOIN notas n ON n.aluno_id = a.id
+                WHERE n.media IS NOT NULL
+            """)
+        else:
+            cur.execute(CONSULTAS_QUENTES["medias_disciplinas_da_turma"][0], (turma,))
+        return estatisticas_por_grupo(cur if tarefa is None else acompanhar_linhas(cur, tarefa))
+
+    def alunos_em_risco(self, turma=None, corte=None, cur=None, tarefa=None):
+        """
+        Disciplinas da turma com componentes ainda em 0,0 cuja média atual está abaixo do corte:
+        [(aluno_id, nome, disciplina, média atual, pendentes, nota necessária, corte)], as mais
+        difíceis primeiro (nota necessária math.inf = não dá mais para atingir o corte).
+        Sem corte, usa a média de aprovação de cada disciplina nas regras_situacao.
+        Os nomes vêm do banco (o aluno pode ter sido gravado por outra instância).
+        """
+        corte_da = self.regras_situacao.corte_aprovacao if corte is None else lambda disciplina: corte
+        cur = cur or self.conexao.cursor()
+        armazem = self.armazem_colunar(turma, cur, tarefa)
+        linhas = []
+        necessarias = armazem.notas_necessarias(self.politica_media, corte_da)
+        for i, pk_id in enumerate(armazem.nota_pk):
+            if pk_id not in necessarias:
+                continue
+            media, pendentes, necessaria = necessarias[pk_id]
+            disciplina = armazem.disciplinas[armazem.nota_disciplina[i]]
+            if media >= corte_da(disciplina):
+                continue
+            linhas.append((armazem.alunos[armazem.nota_aluno[i]], disciplina,
+                           media, pendentes, necessaria, corte_da(disciplina)))
+        nomes = self.nomes_alunos([linha[0] for linha in linhas], cur)
+        linhas = [(aluno_id, nomes.get(aluno_id, aluno_id), *resto) for aluno_id, *resto in linhas]
+        linhas.sort(key=lambda linha: -linha[5])
+        return linhas
+
+    def extremos_medias(self, n, turma=None, disciplina=None, piores=False):
+        """ As n maiores (ou menores) médias gravadas, pelo índice (extremos_sql). """
+        return extremos_sql(self.cursor, n, turma, disciplina, piores)
+
+    def melhores_por_turma(self):
+        """ [(turma, aluno_id, nome, media)] com o melhor aluno de cada turma. """
+        return melhores_por_turma_sql(self.cursor)
+
+    def carregar_dados_em_segundo_plano(self):
+        """
+        Carrega só a lista de alunos (as notas são buscadas sob demanda, obter_notas), com a
+        leitura na thread de trabalho: a janela já abre e a lista aparece no fim.
+        """
+        self.limpar_dados()
+        self.carregando_alunos = True
+
+        def concluir(leitura):
+            self.aplicar_alunos(leitura)
+            self.carregando_alunos = False
+            if getattr(self, 'lista_alunos', None) and self.lista_alunos.tree.winfo_exists():
+                self.atualizar_lista_alunos()
+
+        self.em_segundo_plano(self.ler_alunos, ao_concluir=concluir, descricao="Carregando alunos", cancelavel=False)
+
+    def limpar_dados(self):
         self.alunos.clear()
         self.notas.clear()
+        self.memo_medias.limpar()
+        self.rankings.clear()
+        self.busca = None
+        # data_version da conexão da interface, lido antes da leitura dos alunos: o que for
+        # gravado depois dela é trazido por sincronizar_alteracoes
+        self.cursor.execute("PRAGMA data_version")
+        self.data_version = self.cursor.fetchone()[0]
+
+    def ler_alunos(self, cur, tarefa=None):
+        """
+        (rev, [(id, nome, turma, matricula)]) lidos numa única transação de leitura, em lotes
+        (tarefa.progresso a cada lote). Só usa o cursor recebido: pode rodar no ExecutorTarefas.
+        """
+        cur.execute("BEGIN")
+        try:
+            cur.execute("SELECT CAST(valor AS INTEGER) FROM config WHERE chave = 'rev'")
+            rev = cur.fetchone()[0]
+            cur.execute("SELECT COUNT(*) FROM alunos")
+            total = cur.fetchone()[0]
+            cur.execute("SELECT id, nome, turma, matricula FROM alunos")
+            linhas = []
+            while True:
+                lote = cur.fetchmany(self.TAMANHO_LOTE_MIGRACAO)
+                if not lote:
+                    break
+                linhas.extend(lote)
+                if tarefa: tarefa.progresso(len(linhas), total)
+        finally:
+            cur.execute("COMMIT")
+        return rev, linhas
+
+    def aplicar_alunos(self, leitura):
+        rev, linhas = leitura
+        self.ultima_rev = rev
+        for aluno_id, nome, turma, matricula in linhas:
+            self.alunos[aluno_id] = Aluno(aluno_id, nome, turma, matricula)
+
+    def sincronizar_alteracoes(self):
+        """
+        Atualiza a memória só com as linhas alteradas desde a última leitura
+        (rev maior que self.ultima_rev). PRAGMA data_version só muda quando
+        outra conexão grava no arquivo, então sem alterações externas nada é consultado.
+        """
+        self.cursor.execute("PRAGMA data_version")
+        data_version = self.cursor.fetchone()[0]
+        if data_version == self.data_version:
+            return
+        self.data_version = data_version
 
-        self.cursor.execute("SELECT * FROM alunos")
-        for row in self.cursor.fetchall():
-            aluno_id, nome, matricula, nasc, turma, contato = row
-            self.alunos[aluno_id] = {
-                "nome": nome, "matricula": matricula,
-                "data_nascimento": nasc, "turma": turma, "contato": contato
-            }
-
-        self.cursor.execute("SELECT pk_id, aluno_id, disciplina, componentes FROM notas")
-        for pk_id, aluno_id, disciplina, comp_json in self.cursor.fetchall():
-            comps = json.loads(comp_json)
-            self.notas.setdefault(aluno_id, []).append(
-                {"pk_id": pk_id, "disciplina": disciplina, "componentes": comps}
-            )
+        nova_rev = self.ultima_rev
+        alterados = set()
+        novos, editados = [], False
+        self.cursor.execute("SELECT id, nome, turma, matricula, rev FROM alunos WHERE rev > ?", (self.ultima_rev,))
+        for aluno_id, nome, turma, matricula, rev in self.cursor.fetchall():
+            if aluno_id in self.alunos:
+                editados = True
+            else:
+                novos.append(aluno_id)
+            self.alunos[aluno_id] = aluno = Aluno(aluno_id, nome, turma, matricula)
+            self.indexar_aluno(aluno)
+            alterados.add(aluno_id)
+            nova_rev = max(nova_rev, rev)
+
+        self.cursor.execute("SELECT aluno_id, rev FROM notas WHERE rev > ?", (self.ultima_rev,))
+        for aluno_id, rev in self.cursor.fetchall():
+            self.notas.pop(aluno_id)  # Será buscado de novo em obter_notas
+            self.memo_medias.invalidar(aluno_id)
+            alterados.add(aluno_id)
+            nova_rev = max(nova_rev, rev)
+        self.ultima_rev = nova_rev
+        self.atualizar_rankings(alterados)
+
+        # Alunos incluídos por outra instância vão para o fim da lista; se algum já listado mudou,
+        # a lista é relida desde o topo para não mostrar nome ou turma antigos do cache de páginas
+        if getattr(self, 'lista_alunos', None) and self.lista_alunos.tree.winfo_exists():
+            if novos or editados:
+                self.atualizar_lista_alunos(novos, reler=editados)
+        else:
+            self.ordem_alunos.extend(novos)
+
+    # --- Busca de alunos (IndiceBusca, montado sob demanda) ---
+    def indice_busca(self):
+        """
+        IndiceBusca de todos os alunos. Montado na primeira busca (cerca de 1,5 s para
+        100 mil alunos) e depois mantido a cada inclusão ou alteração de aluno.
+        """
+        if self.busca is None:
+            self.busca = IndiceBusca()
+            for aluno in self.alunos.values():
+                self.busca.adicionar(aluno.id, aluno.nome, aluno.turma, aluno.matricula)
+        return self.busca
+
+    def preparar_indice_busca(self, ao_concluir):
+        """
+        Monta o IndiceBusca no ExecutorTarefas, lendo os alunos do banco, e chama ao_concluir()
+        na thread do Tk quando ele estiver pronto (na hora, se já estiver).
+        """
+        if self.busca is not None:
+            ao_concluir()
+            return
+        self.ao_montar_busca = ao_concluir
+        if self.alunos_sem_busca is not None:
+            return  # Já está sendo montado
+
+        def montar(cur, tarefa):
+            indice = IndiceBusca()
+            cur.execute("SELECT id, nome, turma, matricula FROM alunos")
+            for aluno_id, nome, turma, matricula in acompanhar_linhas(cur, tarefa):
+                indice.adicionar(aluno_id, nome, turma, matricula or "")
+            return indice
+
+        def concluir(indice):
+            if self.busca is None:  # Senão, indice_busca já montou um enquanto isso
+                for aluno_id in self.alunos_sem_busca:
+                    aluno = self.alunos.get(aluno_id)
+                    if aluno:
+                        indice.adicionar(aluno.id, aluno.nome, aluno.turma, aluno.matricula)
+                self.busca = indice
+            self.alunos_sem_busca = None
+            self.ao_montar_busca()
+
+        self.alunos_sem_busca = []
+        self.em_segundo_plano(montar, ao_concluir=concluir)
+
+    def indexar_aluno(self, aluno):
+        """ Inclui (ou atualiza) o aluno no IndiceBusca, se ele já existir ou estiver sendo montado. """
+        if self.busca is not None:
+            self.busca.adicionar(aluno.id, aluno.nome, aluno.turma, aluno.matricula)
+        elif self.alunos_sem_busca is not None:
+            self.alunos_sem_busca.append(aluno.id)
+
+    def buscar_alunos(self, texto):
+        """ Alunos com palavras (nome, turma, matrícula ou ID) começando pelos termos de texto; None sem termos. """
+        if not texto.strip():
+            return None
+        return self.indice_busca().buscar(texto)
+
+    def localizar_aluno(self, texto):
+        """ aluno_id pelo ID exato (qualquer caixa) ou pela matrícula, ou None. """
+        aluno_id = texto.strip().upper()
+        if aluno_id in self.alunos:
+            return aluno_id
+        return self.indice_busca().localizar(texto) if texto.strip() else None
+
+    # --- Classificação (IndiceRanking por turma e disciplina, montado sob demanda) ---
+    def ranking(self, turma, disciplina=None):
+        """
+        IndiceRanking da turma pela média geral (disciplina None) ou pela média de uma
+        disciplina. Montado na primeira consulta a partir das médias gravadas e depois
+        mantido por atualizar_rankings a cada gravação.
+        """
+        chave = (turma, disciplina)
+        indice = self.rankings.get(chave)
+        if indice is None:
+            if disciplina is None:
+                self.cursor.execute(CONSULTAS_QUENTES["turma_por_media"][0], (turma,))
+                pares = [(aluno_id, media) for aluno_id, _, _, media in self.cursor.fetchall()]
+            else:
+                self.cursor.execute(CONSULTAS_QUENTES["disciplina_da_turma"][0], (turma, disciplina))
+                pares = [((aluno_id, pk_id), media) for aluno_id, pk_id, media in self.cursor.fetchall()]
+            indice = self.rankings[chave] = IndiceRanking(pares)
+        return indice
+
+    def classificacao(self, turma, quantidade, disciplina=None, piores=False):
+        """
+        [(ident, posição, aluno_id, nome, média, percentil)] das quantidade maiores (ou menores)
+        médias da turma, pelo IndiceRanking. Os nomes vêm do banco: o índice pode ter alunos
+        gravados por outra instância que ainda não estão em self.alunos.
+        """
+        indice = self.ranking(turma, disciplina)
+        pares = indice.ultimos(quantidade) if piores else indice.top(quantidade)
+        ids = [ident if disciplina is None else ident[0] for ident, _ in pares]
+        nomes = self.nomes_alunos(ids)
+        return [(ident, indice.posicao(ident), aluno_id, nomes.get(aluno_id, aluno_id), media, indice.percentil(ident))
+                for (ident, media), aluno_id in zip(pares, ids)]
+
+    def nomes_alunos(self, ids, cur=None):
+        """ {aluno_id: nome} lidos do banco (em lotes, pelo limite de parâmetros do SQLite). """
+        cur = cur or self.cursor
+        ids = list(dict.fromkeys(ids))
+        nomes = {}
+        for inicio in range(0, len(ids), 500):
+            lote = ids[inicio:inicio + 500]
+            cur.execute(f"SELECT id, nome FROM alunos WHERE id IN ({', '.join('?' * len(lote))})", lote)
+            nomes.update(cur.fetchall())
+        return nomes
+
+    def atualizar_rankings(self, aluno_ids):
+        """ Relê as médias gravadas dos alunos e as atualiza nos rankings já montados. """
+        if not self.rankings:
+            return
+        for aluno_id in aluno_ids:
+            aluno = self.alunos.get(aluno_id)
+            turma = aluno.turma if aluno else None
+            self.cursor.execute("SELECT media FROM alunos WHERE id = ?", (aluno_id,))
+            row = self.cursor.fetchone()
+            media_geral = row[0] if row else None
+            self.cursor.execute("SELECT pk_id, disciplina, media FROM notas WHERE aluno_id = ?", (aluno_id,))
+            notas_aluno = self.cursor.fetchall()
+            for (turma_indice, disciplina_indice), indice in self.rankings.items():
+                mesma_turma = turma_indice == turma
+                if disciplina_indice is None:
+                    indice.atualizar(aluno_id, media_geral if mesma_turma else None)
+                    continue
+                for pk_id, disciplina, media in notas_aluno:
+                    indice.atualizar((aluno_id, pk_id),
+                                     media if mesma_turma and disciplina == disciplina_indice else None)
+
+    def posicao_aluno(self, aluno_id, disciplina=None):
+        """ (posição, total, percentil) do aluno na turma, ou None se ele não tiver média. """
+        aluno = self.alunos[aluno_id]
+        indice = self.ranking(aluno.turma, disciplina)
+        if disciplina is None:
+            ident = aluno_id
+        else:
+            ident = next((i for i in ((aluno_id, n.pk_id) for n in self.obter_notas(aluno_id)
+                                      if n.disciplina == disciplina) if i in indice), None)
+        if ident is None or ident not in indice:
+            return None
+        return indice.posicao(ident), len(indice), indice.percentil(ident)
+
+    def obter_notas(self, aluno_id):
+        """ Retorna as notas de um aluno, usando o cache LRU ou buscando no banco. """
+        notas_aluno = self.notas.get(aluno_id)
+        if notas_aluno is not None:
+            return notas_aluno
+
+        self.cursor.execute(CONSULTAS_QUENTES["notas_do_aluno"][0], (aluno_id,))
+        notas_aluno = []
+        item = None
+        for pk_id, disciplina, nome, nota, peso in self.cursor.fetchall():
+            if item is None or item.pk_id != pk_id:
+                item = NotaDisciplina(pk_id, disciplina, [])
+                notas_aluno.append(item)
+            if nome is not None:
+                item.componentes.append(Componente(nome, nota, peso))
+        self.notas[aluno_id] = notas_aluno
+        return notas_aluno
+
+    # ======================================================
+    # ESCRITA (UMA TRANSAÇÃO POR AÇÃO DO USUÁRIO)
+    # ======================================================
+    @contextmanager
+    def transacao(self):
+        """
+        Transação na conexão da interface: tudo o que for gravado dentro do bloco é
+        confirmado com um único commit ao sair (ou desfeito se houver erro). Blocos
+        aninhados fazem parte da transação mais externa.
+        """
+        self.nivel_transacao += 1
+        try:
+            yield self.cursor
+        except BaseException:
+            self.nivel_transacao -= 1
+            if self.nivel_transacao == 0:
+                self.conexao.rollback()
+            raise
+        self.nivel_transacao -= 1
+        if self.nivel_transacao == 0:
+            self.conexao.commit()
+
+    def executar_escrita(self, operacao, *args):
+        """
+        Unidade de trabalho: executa operacao(cur, *args) numa única transação e
+        retorna o resultado. No modo WAL a operação roda na thread do EscritorSQLite;
+        caso contrário, na conexão da interface.
+        As operações só podem usar o cursor recebido, nunca self.cursor ou widgets.
+        Espera o commit: na thread do Tk, use as ações com ao_concluir (escrever_em_segundo_plano).
+        """
+        if self.escritor:
+            return self.escritor.submeter(operacao, *args).result()
+        with self.transacao() as cur:
+            return operacao(cur, *args)
+
+    # --- Operações de gravação (recebem o cursor, não fazem commit) ---
+    def gravar_config(self, cur, chave, valor):
+        cur.execute("INSERT OR REPLACE INTO config VALUES (?, ?)", (chave, valor))
+
+    def proxima_revisao(self, cur):
+        """ Incrementa o contador global de revisões e retorna o novo valor. """
+        cur.execute("UPDATE config SET valor = CAST(valor AS INTEGER) + 1 WHERE chave = 'rev'")
+        cur.execute("SELECT CAST(valor AS INTEGER) FROM config WHERE chave = 'rev'")
+        return cur.fetchone()[0]
+
+    def gravar_aluno(self, cur, aluno_id, dados):
+        cur.execute("""INSERT INTO alunos (id, nome, matricula, data_nascimento, turma, contato, rev)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (aluno_id, dados['nome'], dados.get('matricula', ''),
+                     dados.get('data_nascimento', ''), dados['turma'], dados.get('contato', ''),
+                     self.proxima_revisao(cur)))
+
+    def gravar_notas(self, cur, aluno_id, disciplina, comps):
+        """ Grava uma disciplina nova com seus componentes e retorna o pk_id. """
+        cur.execute("INSERT INTO notas (aluno_id, disciplina, componentes, rev) VALUES (?, ?, '[]', ?)",
+                    (aluno_id, disciplina, self.proxima_revisao(cur)))
+        pk_id = cur.lastrowid
+        self.salvar_componentes(cur, pk_id, comps)
+        self.atualizar_medias(cur, aluno_id, pk_id, comps)
+        return pk_id
+
+    def gravar_componentes(self, cur, aluno_id, pk_id, comps):
+        """ Substitui os componentes de uma disciplina já gravada. """
+        cur.execute("DELETE FROM componentes WHERE nota_pk = ?", (pk_id,))
+        self.salvar_componentes(cur, pk_id, comps)
+        cur.execute("UPDATE notas SET rev = ? WHERE pk_id = ?", (self.proxima_revisao(cur), pk_id))
+        self.atualizar_medias(cur, aluno_id, pk_id, comps)
+
+    def salvar_componentes(self, cur, pk_id, comps):
+        """ Grava a lista de componentes de uma disciplina. """
+        cur.executemany(
+            "INSERT INTO componentes (nota_pk, nome, nota, peso, ordem) VALUES (?, ?, ?, ?, ?)",
+            [(pk_id, c.nome, c.nota, c.peso, ordem) for ordem, c in enumerate(comps)]
+        )
+
+    def atualizar_medias(self, cur, aluno_id, pk_id, comps):
+        """
+        Grava a média da disciplina e a média geral do aluno. Deve ser chamada
+        na mesma transação que grava os componentes.
+        """
+        media = self.calcular_media_por_disciplina(NotaDisciplina(pk_id, "", comps))
+        cur.execute("SELECT disciplina FROM notas WHERE pk_id = ?", (pk_id,))
+        situacao = self.regras_situacao.avaliar(cur.fetchone()[0], media, [c.nota for c in comps])
+        cur.execute("UPDATE notas SET media = ?, situacao = ? WHERE pk_id = ?", (media, situacao, pk_id))
+        self.atualizar_media_aluno(cur, aluno_id)
+
+    def atualizar_media_aluno(self, cur, aluno_id):
+        """ Recalcula alunos.media e alunos.situacao a partir das disciplinas já gravadas. """
+        cur.execute("SELECT media, situacao FROM notas WHERE aluno_id = ? ORDER BY pk_id", (aluno_id,))
+        linhas = cur.fetchall()
+        media_geral = self.calcular_media_geral([row[0] for row in linhas]) if linhas else None
+        situacao = self.regras_situacao.situacao_geral([row[1] for row in linhas])
+        cur.execute("UPDATE alunos SET media = ?, situacao = ? WHERE id = ?", (media_geral, situacao, aluno_id))
+
+    def gravar_medias_notas(self, cur, ultimo_pk, tamanho):
+        """ Recalcula notas.media e notas.situacao do próximo lote; retorna (último pk_id, quantidade). """
+        cur.execute("SELECT pk_id, disciplina FROM notas WHERE pk_id > ? ORDER BY pk_id LIMIT ?", (ultimo_pk, tamanho))
+        lote = cur.fetchall()
+        if not lote:
+            return None, 0
+        cur.execute("""
+            SELECT nota_pk, nota, peso FROM componentes
+            WHERE nota_pk BETWEEN ? AND ? ORDER BY nota_pk, ordem
+        """, (lote[0][0], lote[-1][0]))
+        comps = {}
+        for nota_pk, nota, peso in cur.fetchall():
+            comps.setdefault(nota_pk, []).append(Componente("", nota, peso))
+        avaliar = self.regras_situacao.avaliar
+        valores = []
+        for pk, disciplina in lote:
+            comps_nota = comps.get(pk, [])
+            media = self.calcular_media_por_disciplina(NotaDisciplina(pk, disciplina, comps_nota))
+            valores.append((media, avaliar(disciplina, media, [c.nota for c in comps_nota]), pk))
+        cur.executemany("UPDATE notas SET media = ?, situacao = ? WHERE pk_id = ?", valores)
+        return lote[-1][0], len(lote)
+
+    def gravar_medias_alunos(self, cur, ultimo_id, tamanho):
+        """ Recalcula alunos.media do próximo lote de alunos; retorna o último id (None no fim). """
+        cur.execute("SELECT id FROM alunos WHERE id > ? ORDER BY id LIMIT ?", (ultimo_id, tamanho))
+        lote = [row[0] for row in cur.fetchall()]
+        for aluno_id in lote:
+            self.atualizar_media_aluno(cur, aluno_id)
+        return lote[-1] if lote else None
+
+    def recalcular_medias_gravadas(self, executar, progresso=None, cur=None):
+        """
+        Regrava todas as médias e situações (notas e alunos) em lotes, um commit por lote.
+        executar(operacao, *args) é executar_escrita ou executar_na_migracao; cur, o cursor
+        usado para contar as notas (o da thread de trabalho, se rodar no ExecutorTarefas).
+        """
+        cur = cur or self.cursor
+        cur.execute("SELECT COUNT(*) FROM notas")
+        total = cur.fetchone()[0]
+        feitos, ultimo_pk = 0, 0
+        while True:
+            ultimo_pk, quantidade = executar(self.gravar_medias_notas, ultimo_pk, self.TAMANHO_LOTE_MIGRACAO)
+            if ultimo_pk is None:
+                break
+            feitos += quantidade
+            if progresso: progresso(feitos, total)
+        ultimo_id = ""
+        while ultimo_id is not None:
+            ultimo_id = executar(self.gravar_medias_alunos, ultimo_id, self.TAMANHO_LOTE_MIGRACAO)
+
+    # --- Ações (uma transação cada) que também atualizam a memória ---
+    def salvar_config(self, chave, valor, ao_concluir=None):
+        """ Grava uma configuração; com ao_concluir, sem esperar (ao_concluir(None) depois do commit). """
+        if ao_concluir is None:
+            self.executar_escrita(self.gravar_config, chave, valor)
+        else:
+            self.acompanhar(self.escrever_em_segundo_plano(self.gravar_config, chave, valor), ao_concluir,
+                            descricao="Gravando configuração")
+
+    def importar_alunos(self, lista_dados, ao_concluir=None):
+        """
+        Cadastra vários alunos com um único commit. Retorna os IDs gerados.
+        Com ao_concluir, não espera a gravação: os alunos entram na memória e
+        ao_concluir(ids) é chamado na thread do Tk depois do commit.
+        """
+        ids = []
+        usados = set()
+        for _ in lista_dados:
+            # 8 caracteres se repetem com frequência a partir de dezenas de milhares de alunos
+            aluno_id = str(uuid.uuid4())[:8].upper()
+            while aluno_id in self.alunos or aluno_id in usados:
+                aluno_id = str(uuid.uuid4())[:8].upper()
+            usados.add(aluno_id)
+            ids.append(aluno_id)
+        def operacao(cur):
+            for aluno_id, dados in zip(ids, lista_dados):
+                self.gravar_aluno(cur, aluno_id, dados)
+
+        def registrar(_=None):
+            for aluno_id, dados in zip(ids, lista_dados):
+                self.alunos[aluno_id] = aluno = Aluno(aluno_id, dados['nome'], dados['turma'], dados.get('matricula', ''))
+                self.indexar_aluno(aluno)
+            if ao_concluir:
+                ao_concluir(ids)
+
+        if ao_concluir is None:
+            self.executar_escrita(operacao)
+            registrar()
+        else:
+            self.acompanhar(self.escrever_em_segundo_plano(operacao), registrar, descricao="Gravando alunos")
+        return ids
+
+    def inserir_aluno(self, dados, ao_concluir=None):
+        """ Cadastra um aluno e retorna o ID gerado (com ao_concluir, ao_concluir(id) depois do commit). """
+        return self.importar_alunos([dados], ao_concluir and (lambda ids: ao_concluir(ids[0])))[0]
+
+    def salvar_notas_lote(self, lancamentos, alteracoes=(), ao_concluir=None):
+        """
+        Grava as notas de vários alunos (ex.: uma turma inteira) com um único commit.
+        lancamentos: [(aluno_id, disciplina, comps)] de disciplinas novas;
+        alteracoes: [(aluno_id, pk_id, comps)] que substituem os componentes de disciplinas já gravadas.
+        Retorna os pk_id criados. Com ao_concluir, não espera a gravação: a memória é
+        atualizada e ao_concluir(pk_ids) é chamado na thread do Tk depois do commit.
+        """
+        def operacao(cur):
+            for aluno_id, pk_id, comps in alteracoes:
+                self.gravar_componentes(cur, aluno_id, pk_id, comps)
+            return [self.gravar_notas(cur, aluno_id, disc, comps) for aluno_id, disc, comps in lancamentos]
+
+        def registrar(pk_ids):
+            for aluno_id, pk_id, comps in alteracoes:
+                self.memo_medias.invalidar(aluno_id)
+                for item in self.notas.get(aluno_id, []):
+                    if item.pk_id == pk_id:
+                        item.componentes = comps
+                        break
+            for pk_id, (aluno_id, disc, comps) in zip(pk_ids, lancamentos):
+                self.memo_medias.invalidar(aluno_id)
+                if aluno_id in self.notas:
+                    self.notas.get(aluno_id).append(NotaDisciplina(pk_id, disc, comps))
+            self.atualizar_rankings({aluno_id for aluno_id, _, _ in lancamentos} |
+                                    {aluno_id for aluno_id, _, _ in alteracoes})
+            if ao_concluir:
+                ao_concluir(pk_ids)
+            return pk_ids
+
+        if ao_concluir is None:
+            return registrar(self.executar_escrita(operacao))
+        self.acompanhar(self.escrever_em_segundo_plano(operacao), registrar, descricao="Gravando notas")
+        return None
+
+    def inserir_notas(self, aluno_id, disciplina, comps, ao_concluir=None):
+        """ Grava uma disciplina nova com seus componentes e retorna o pk_id (sem ao_concluir). """
+        pk_ids = self.salvar_notas_lote([(aluno_id, disciplina, comps)], ao_concluir=ao_concluir)
+        return pk_ids[0] if pk_ids else None
+
+    def atualizar_componentes(self, aluno_id, pk_id, comps, ao_concluir=None):
+        """ Substitui os componentes de uma disciplina já gravada. """
+        self.salvar_notas_lote([], [(aluno_id, pk_id, comps)], ao_concluir)
+
+    def notas_da_turma(self, turma, disciplina):
+        """
+        Alunos da turma [(id, nome)] em ordem de nome e {aluno_id: NotaDisciplina} dos que
+        já têm a disciplina (a primeira, se houver mais de uma), para a grade de notas.
+        """
+        self.cursor.execute(CONSULTAS_QUENTES["alunos_da_turma"][0], (turma,))
+        alunos = self.cursor.fetchall()
+        self.cursor.execute(CONSULTAS_QUENTES["componentes_da_turma"][0], (turma, disciplina))
+        existentes = {}
+        item = None
+        for aluno_id, pk_id, nome, nota, peso in self.cursor.fetchall():
+            if item is None or item.pk_id != pk_id:
+                item = NotaDisciplina(pk_id, disciplina, [])
+                existentes.setdefault(aluno_id, item)
+            if nome is not None:
+                item.componentes.append(Componente(nome, nota, peso))
+        return alunos, existentes
+
+    def definir_criterios(self, codigo, regras, progresso=None, ao_concluir=None):
+        """
+        Troca a política de média e as regras de situação e regrava médias e situações de uma vez.
+        Com ao_concluir, a regravação roda no ExecutorTarefas (janela de progresso, sem cancelar:
+        as médias ficariam metade em cada regra) e ao_concluir() é chamado no fim.
+        """
+        self.politica_media = criar_politica_media(codigo)
+        self.regras_situacao = regras
+        self.memo_medias.limpar()
+        self.rankings.clear()
+        if ao_concluir is None:
+            self.salvar_config('politica_media', self.politica_media.codigo)
+            self.salvar_config('regras_situacao', regras.para_json())
+            self.recalcular_medias_gravadas(self.executar_escrita, progresso)
+            self.rankings.clear()
+            return
+
+        codigo_politica, regras_json = self.politica_media.codigo, regras.para_json()
+
+        def recalcular(cur, tarefa):
+            executar = self.executar_escrita if self.escritor else partial(executar_em_transacao, cur)
+            executar(self.gravar_config, 'politica_media', codigo_politica)
+            executar(self.gravar_config, 'regras_situacao', regras_json)
+            self.recalcular_medias_gravadas(executar, tarefa.progresso, cur)
+
+        def concluir(_):
+            self.rankings.clear()  # Montadas a partir das médias gravadas, que acabaram de mudar
+            ao_concluir()
+
+        self.em_segundo_plano(recalcular, ao_concluir=concluir, descricao="Recalculando médias", cancelavel=False)
+
+    def fechar(self):
+        """ Cancela as tarefas em segundo plano, espera as gravações pendentes e encerra as threads. """
+        for tarefa in getattr(self, 'tarefas', []):
+            if isinstance(tarefa["futuro"], Tarefa):
+                tarefa["futuro"].cancelar()
+        if getattr(self, 'executor', None):
+            self.executor.parar()
+            self.executor = None
+        if getattr(self, 'escritor', None):
+            self.escritor.parar()
+            self.escritor = None
+
+    # --- Tarefas em segundo plano (ExecutorTarefas), acompanhadas com root.after ---
+    def em_segundo_plano(self, operacao, *args, ao_concluir=None, descricao=None, cancelavel=True, parent=None):
+        """
+        Roda operacao(cur, tarefa, *args) no ExecutorTarefas e chama ao_concluir(resultado)
+        na thread do Tk. Retorna a Tarefa. A operação não pode tocar em widgets.
+        """
+        tarefa = self.executor.submeter(operacao, *args, descricao=descricao or "")
+        self.acompanhar(tarefa, ao_concluir, descricao, cancelavel, parent)
+        return tarefa
+
+    def escrever_em_segundo_plano(self, operacao, *args):
+        """ Como executar_escrita, mas sem esperar: retorna o Future da gravação (acompanhar). """
+        if self.escritor:
+            return self.escritor.submeter(operacao, *args)
+        return self.executor.submeter(lambda cur, tarefa: executar_em_transacao(cur, operacao, *args))
+
+    def acompanhar(self, futuro, ao_concluir=None, descricao=None, cancelavel=False, parent=None):
+        """
+        Chama ao_concluir(resultado) na thread do Tk quando o futuro (Tarefa ou gravação do
+        EscritorSQLite) terminar. Com descricao, mostra uma janela de progresso se demorar mais
+        que ATRASO_JANELA_PROGRESSO_MS (com Cancelar, se cancelavel). Erros aparecem numa
+        messagebox (sem janela, no stderr); uma tarefa cancelada só some.
+        """
+        self.tarefas.append({"futuro": futuro, "ao_concluir": ao_concluir, "descricao": descricao,
+                             "cancelavel": cancelavel, "parent": parent, "janela": None,
+                             "inicio": time.monotonic()})
+        if not self.verificando_tarefas:
+            self.verificando_tarefas = True
+            self.root.after(INTERVALO_TAREFAS_MS, self.verificar_tarefas)
+
+    def verificar_tarefas(self):
+        """
+        Roda a cada INTERVALO_TAREFAS_MS enquanto houver tarefas: progresso e entrega dos resultados.
+        Um ao_concluir que falhe é informado como a própria tarefa e não interrompe as demais.
+        """
+        pendentes, self.tarefas = self.tarefas, []
+        try:
+            while pendentes:
+                tarefa = pendentes.pop(0)
+                futuro = tarefa["futuro"]
+                if not futuro.done():
+                    if tarefa["descricao"] and (tarefa["janela"] or time.monotonic() - tarefa["inicio"]
+                                                >= ATRASO_JANELA_PROGRESSO_MS / 1000):
+                        self.atualizar_janela_progresso(tarefa)
+                    self.tarefas.append(tarefa)
+                    continue
+                if tarefa["janela"]:
+                    tarefa["janela"][0].destroy()
+                try:
+                    resultado = futuro.result()
+                    if tarefa["ao_concluir"]:
+                        tarefa["ao_concluir"](resultado)
+                except (TarefaCancelada, CancelledError):
+                    continue
+                except Exception as e:
+                    if not self.janela:
+                        print(f"{tarefa['descricao'] or 'A operação'} falhou: {e}", file=sys.stderr)
+                        continue
+                    parent = tarefa["parent"] if tarefa["parent"] and tarefa["parent"].winfo_exists() else self.root
+                    messagebox.showerror("Erro", f"{tarefa['descricao'] or 'A operação'} falhou: {e}", parent=parent)
+        finally:
+            # Se algo acima falhar, as tarefas ainda não vistas continuam sendo acompanhadas
+            self.tarefas.extend(pendentes)
+            if self.tarefas:
+                self.root.after(INTERVALO_TAREFAS_MS, self.verificar_tarefas)
+            else:
+                self.verificando_tarefas = False
+
+    def atualizar_janela_progresso(self, tarefa):
+        """ Cria (na primeira vez) e atualiza a janela de progresso de uma tarefa em andamento. """
+        if not self.janela:
+            return
+        futuro = tarefa["futuro"]
+        if tarefa["janela"] is None:
+            parent = tarefa["parent"] if tarefa["parent"] and tarefa["parent"].winfo_exists() else self.root
+            top = tk.Toplevel(parent)
+            top.title(tarefa["descricao"])
+            top.geometry("420x140")
+            top.transient(parent)
+            label = ttk.Label(top)
+            label.pack(pady=10)
+            barra = ttk.Progressbar(top, length=360, mode='determinate')
+            barra.pack(pady=5)
+            if tarefa["cancelavel"]:
+                def cancelar():
+                    futuro.cancelar()
+                    label.config(text="Cancelando...")
+                ttk.Button(top, text="Cancelar", command=cancelar).pack(pady=5)
+                top.protocol("WM_DELETE_WINDOW", cancelar)
+            else:
+                top.protocol("WM_DELETE_WINDOW", lambda: None)
+            top.grab_set()  # Nada de iniciar outra ação sobre os mesmos dados enquanto isso
+            tarefa["janela"] = (top, label, barra)
+        top, label, barra = tarefa["janela"]
+        if getattr(futuro, "cancelada", False):
+            return
+        feitos, total = getattr(futuro, "feitos", 0), getattr(futuro, "total", None)
+        if total:
+            barra.config(mode='determinate', maximum=total, value=feitos)
+            label.config(text=f"{tarefa['descricao']}... {feitos}/{total}")
+        else:
+            barra.config(mode='indeterminate')
+            barra.step(5)
+            label.config(text=f"{tarefa['descricao']}... {feitos}" if feitos else f"{tarefa['descricao']}...")
 
     # ======================================================
     # INTERFACE
@@ -156,6 +2607,12 @@ class GerenciadorNotasApp:
     def formatar_numero(self, numero, casas=2):
         return f"{numero:.{casas}f}".replace('.', ',')
 
+    def formatar_nota(self, centesimos, casas=2):
+        return formatar_centesimos(centesimos, casas)
+
+    def ler_nota(self, texto):
+        return ler_centesimos(texto)
+
     def show_main_menu(self):
         self.clear_frame()
         self.current_frame = ttk.Frame(self.root, padding="80", style="TFrame")
@@ -194,21 +2651,54 @@ class GerenciadorNotasApp:
 
         ttk.Label(left, text="MENU DE AÇÕES", style="Header.TLabel").pack(pady=10, fill='x')
 
-        ttk.Button(left, text="➕ Adicionar Aluno", command=self.adicionar_aluno_gui).pack(pady=10, fill='x')
-        ttk.Button(left, text="📝 Atribuir Notas", command=self.adicionar_notas_gui).pack(pady=10, fill='x')
-        ttk.Button(left, text="✏️ Editar Notas", command=self.editar_notas_gui).pack(pady=10, fill='x') 
-        ttk.Button(left, text="📈 Visualizar Notas", command=self.visualizar_notas_gui).pack(pady=10, fill='x')
-        ttk.Button(left, text="🧮 Calcular Média", command=self.calcular_media_gui).pack(pady=10, fill='x')
-        ttk.Button(left, text="🔑 Alterar Senha", command=self.alterar_senha_gui).pack(pady=10, fill='x')
-        ttk.Button(left, text="⬅️ Voltar", command=self.show_main_menu).pack(pady=30, fill='x')
-
-        self.tree = ttk.Treeview(self.current_frame, columns=('Nome', 'Turma', 'ID'), show='headings')
-        self.tree.heading('Nome', text='Nome')
-        self.tree.heading('Turma', text='Turma')
-        self.tree.heading('ID', text='ID do Aluno')
-        self.tree.pack(expand=True, fill='both', padx=10, pady=10)
+        ttk.Button(left, text="➕ Adicionar Aluno", command=self.adicionar_aluno_gui).pack(pady=5, fill='x')
+        ttk.Button(left, text="📥 Importar Alunos", command=self.importar_alunos_gui).pack(pady=5, fill='x')
+        ttk.Button(left, text="📝 Atribuir Notas", command=self.adicionar_notas_gui).pack(pady=5, fill='x')
+        ttk.Button(left, text="🗂️ Notas da Turma", command=self.lancar_notas_turma_gui).pack(pady=5, fill='x')
+        ttk.Button(left, text="✏️ Editar Notas", command=self.editar_notas_gui).pack(pady=5, fill='x') 
+        ttk.Button(left, text="📈 Visualizar Notas", command=self.visualizar_notas_gui).pack(pady=5, fill='x')
+        ttk.Button(left, text="🧮 Calcular Média", command=self.calcular_media_gui).pack(pady=5, fill='x')
+        ttk.Button(left, text="🏆 Classificação", command=self.ranking_gui).pack(pady=5, fill='x')
+        ttk.Button(left, text="📊 Estatísticas", command=self.estatisticas_gui).pack(pady=5, fill='x')
+        ttk.Button(left, text="🎯 Alunos em Risco", command=self.alunos_em_risco_gui).pack(pady=5, fill='x')
+        ttk.Button(left, text="⚙️ Critérios de Avaliação", command=self.criterios_gui).pack(pady=5, fill='x')
+        ttk.Button(left, text="🔑 Alterar Senha", command=self.alterar_senha_gui).pack(pady=5, fill='x')
+        ttk.Button(left, text="⬅️ Voltar", command=self.show_main_menu).pack(pady=20, fill='x')
+
+        busca_frame = ttk.Frame(self.current_frame, style="TFrame")
+        busca_frame.pack(fill='x', padx=10, pady=(10, 0))
+        ttk.Label(busca_frame, text="🔍 Buscar (nome, turma, matrícula ou ID):").pack(side="left", padx=5)
+        busca_var = tk.StringVar()
+        busca_entry = ttk.Entry(busca_frame, textvariable=busca_var)
+        busca_entry.pack(side="left", fill='x', expand=True, padx=5)
+        encontrados_label = ttk.Label(busca_frame, text="")
+        encontrados_label.pack(side="left", padx=5)
+
+        # Só as linhas visíveis existem na Treeview; o restante vem de pagina_alunos ao rolar
+        self.filtro_alunos = ""
+        self.resultado_busca = None
+        self.lista_alunos = ListaVirtual(self.current_frame, ('Nome', 'Turma', 'ID'),
+                                         ('Nome', 'Turma', 'ID do Aluno'),
+                                         lambda: len(self.alunos_listados()), self.pagina_alunos, coluna_chave=2)
+        self.tree = self.lista_alunos.tree
+        self.lista_alunos.pack(expand=True, fill='both', padx=10, pady=10)
         self.atualizar_lista_alunos()
 
+        def filtrar(*_):
+            if not encontrados_label.winfo_exists():
+                return
+            if self.busca is None and busca_var.get().strip():
+                # Primeira busca: o índice é montado em segundo plano e a busca roda quando ficar pronto
+                encontrados_label.config(text="Indexando alunos...")
+                self.preparar_indice_busca(filtrar)
+                return
+            self.filtrar_lista_alunos(busca_var.get())
+            encontrados_label.config(text="" if self.resultado_busca is None
+                                     else f"{len(self.resultado_busca)} encontrado(s)")
+
+        busca_var.trace_add("write", filtrar)
+        busca_entry.bind("<Down>", lambda e: self.tree.focus_set() or self.lista_alunos.mover(0))
+
     def alterar_senha_gui(self):
         atual = simpledialog.askstring("Senha Atual", "Digite a senha atual:", show='*', parent=self.root)
         if atual != self.prof_password:
@@ -216,22 +2706,283 @@ class GerenciadorNotasApp:
             return
         nova = simpledialog.askstring("Nova Senha", "Digite a nova senha:", show='*', parent=self.root)
         if nova:
-            self.salvar_senha_professor(nova)
-            messagebox.showinfo("Sucesso", "Senha alterada com sucesso!")
+            self.salvar_senha_professor(nova, lambda _: messagebox.showinfo("Sucesso", "Senha alterada com sucesso!"))
+
+    def ranking_gui(self):
+        """ Melhores ou piores médias de uma turma ou da escola, na média geral ou em uma disciplina. """
+        top = tk.Toplevel(self.root)
+        top.title("Classificação")
+        top.geometry("760x550")
+        frame = ttk.Frame(top, padding=20, style="Content.TFrame")
+        frame.pack(expand=True, fill="both")
+
+        filtros = ttk.Frame(frame, style="Content.TFrame")
+        filtros.pack(fill="x", pady=5)
+        turmas = ["Toda a escola"] + sorted({aluno.turma for aluno in self.alunos.values()})
+        self.cursor.execute("SELECT DISTINCT disciplina FROM notas ORDER BY disciplina")
+        disciplinas = ["Média geral"] + [row[0] for row in self.cursor.fetchall()]
+
+        ttk.Label(filtros, text="Turma:").pack(side="left", padx=5)
+        turma_combo = ttk.Combobox(filtros, values=turmas, state="readonly", width=12)
+        turma_combo.set(turmas[0])
+        turma_combo.pack(side="left", padx=5)
+        ttk.Label(filtros, text="Disciplina:").pack(side="left", padx=5)
+        disc_combo = ttk.Combobox(filtros, values=disciplinas, state="readonly", width=15)
+        disc_combo.set(disciplinas[0])
+        disc_combo.pack(side="left", padx=5)
+        ordem_combo = ttk.Combobox(filtros, values=["Melhores", "Piores"], state="readonly", width=9)
+        ordem_combo.set("Melhores")
+        ordem_combo.pack(side="left", padx=5)
+        qtd_spin = ttk.Spinbox(filtros, from_=1, to=1000, width=5)
+        qtd_spin.set(10)
+        qtd_spin.pack(side="left", padx=5)
+
+        cols = ('Posição', 'Nome', 'Turma', 'Média', 'Percentil')
+        tree = ttk.Treeview(frame, columns=cols, show='headings')
+        for col in cols: tree.heading(col, text=col)
+        tree.pack(expand=True, fill='both', pady=10)
+        linhas = ReconciliadorTreeview(tree)
+
+        def mostrar():
+            try:
+                quantidade = int(qtd_spin.get())
+            except ValueError:
+                quantidade = 10
+            disciplina = None if disc_combo.get() == disciplinas[0] else disc_combo.get()
+            piores = ordem_combo.get() == "Piores"
+            if turma_combo.get() == turmas[0]:
+                # Escola toda: direto do índice de médias, sem montar classificação
+                linhas.reconciliar(
+                    (aluno_id, (f"{i}º" if not piores else "", nome, turma, self.formatar_nota(media), ""))
+                    for i, (aluno_id, nome, turma, media) in enumerate(
+                        self.extremos_medias(quantidade, disciplina=disciplina, piores=piores), start=1))
+                return
+            linhas.reconciliar(
+                (ident, (f"{posicao}º", nome, turma_combo.get(), self.formatar_nota(media),
+                         self.formatar_numero(percentil, 1) + "%"))
+                for ident, posicao, _, nome, media, percentil in self.classificacao(
+                    turma_combo.get(), quantidade, disciplina, piores))
+
+        def mostrar_melhor_por_turma():
+            linhas.reconciliar((aluno_id, ("1º", nome, turma, self.formatar_nota(media), ""))
+                               for turma, aluno_id, nome, media in self.melhores_por_turma())
+
+        ttk.Button(filtros, text="Mostrar", command=mostrar).pack(side="left", padx=5)
+        ttk.Button(frame, text="🏅 Melhor de cada turma", command=mostrar_melhor_por_turma).pack(pady=5)
+        mostrar()
+
+    def estatisticas_gui(self):
+        """ Média, desvio padrão, mínimo, máximo e histograma das médias por turma e disciplina. """
+        top = tk.Toplevel(self.root)
+        top.title("Estatísticas")
+        top.geometry("800x600")
+        frame = ttk.Frame(top, padding=20, style="Content.TFrame")
+        frame.pack(expand=True, fill="both")
+
+        filtros = ttk.Frame(frame, style="Content.TFrame")
+        filtros.pack(fill="x", pady=5)
+        turmas = ["Todas"] + sorted({aluno.turma for aluno in self.alunos.values()})
+        ttk.Label(filtros, text="Turma:").pack(side="left", padx=5)
+        turma_combo = ttk.Combobox(filtros, values=turmas, state="readonly", width=12)
+        turma_combo.set(turmas[0])
+        turma_combo.pack(side="left", padx=5)
+
+        cols = ('Turma', 'Disciplina', 'Notas', 'Média', 'Desvio Padrão', 'Mínima', 'Máxima')
+        tree = ttk.Treeview(frame, columns=cols, show='headings')
+        for col in cols:
+            tree.heading(col, text=col)
+            tree.column(col, width=100)
+        tree.pack(expand=True, fill='both', pady=10)
+        histograma_label = ttk.Label(frame, text="Selecione uma linha para ver o histograma.",
+                                     font=('Courier', 10), justify="left")
+        histograma_label.pack(fill="x")
+        linhas = ReconciliadorTreeview(tree)
+        resultado = {}
+
+        def mostrar():
+            turma = None if turma_combo.get() == turmas[0] else turma_combo.get()
+            self.em_segundo_plano(lambda cur, tarefa: self.estatisticas_notas(turma, cur, tarefa),
+                                  ao_concluir=exibir, descricao="Calculando estatísticas", parent=top)
+
+        def exibir(estatisticas):
+            if not top.winfo_exists(): return
+            resultado.clear()
+            resultado.update(estatisticas)
+            # Totais (None) depois dos grupos, cada coluna em ordem alfabética
+            linhas.reconciliar(
+                (chave, (chave[0] or "Todas", chave[1] or "Todas", e.quantidade,
+                         self.formatar_numero(e.media / ESCALA_NOTA), self.formatar_numero(e.desvio_padrao / ESCALA_NOTA),
+                         self.formatar_nota(e.minimo), self.formatar_nota(e.maximo)))
+                for chave, e in sorted(resultado.items(),
+                                       key=lambda i: (i[0][0] is None, i[0][0] or "", i[0][1] is None, i[0][1] or "")))
+            mostrar_histograma()
+
+        def mostrar_histograma(event=None):
+            chave = linhas.chave_selecionada()
+            if chave not in resultado: return
+            e = resultado[chave]
+            maior = max(e.histograma) or 1
+            barras = [f"{i:>2}-{i + 1:<2} | {'█' * round(30 * q / maior):<30} {q}" for i, q in enumerate(e.histograma)]
+            histograma_label.config(text="\n".join(barras))
+
+        tree.bind("<<TreeviewSelect>>", mostrar_histograma)
+        ttk.Button(filtros, text="Mostrar", command=mostrar).pack(side="left", padx=5)
+        mostrar()
+
+    def alunos_em_risco_gui(self):
+        """ Nota mínima que falta em cada disciplina abaixo da média, para uma turma. """
+        top = tk.Toplevel(self.root)
+        top.title("Alunos em Risco")
+        top.geometry("800x600")
+        frame = ttk.Frame(top, padding=20, style="Content.TFrame")
+        frame.pack(expand=True, fill="both")
+
+        filtros = ttk.Frame(frame, style="Content.TFrame")
+        filtros.pack(fill="x", pady=5)
+        turmas = sorted({aluno.turma for aluno in self.alunos.values()})
+        ttk.Label(filtros, text="Turma:").pack(side="left", padx=5)
+        turma_combo = ttk.Combobox(filtros, values=turmas, state="readonly", width=12)
+        turma_combo.pack(side="left", padx=5)
+        regras = self.regras_situacao
+        cortes_proprios = "".join(f"; {disciplina}: {self.formatar_nota(aprovacao, 1)}"
+                                  for disciplina, (aprovacao, _) in sorted(regras.por_disciplina.items()))
+        ttk.Label(frame, text=f"Nota que falta tirar nos componentes ainda em 0,0 para chegar à média de aprovação "
+                              f"({self.formatar_nota(regras.aprovacao, 1)}{cortes_proprios}):",
+                  wraplength=740).pack(pady=5, anchor="w")
+
+        cols = ('Aluno', 'Disciplina', 'Média Atual', 'Aprovação', 'Pendentes', 'Nota Necessária')
+        tree = ttk.Treeview(frame, columns=cols, show='headings')
+        for col in cols: tree.heading(col, text=col)
+        tree.pack(expand=True, fill='both', pady=10)
+        linhas = ReconciliadorTreeview(tree)
+
+        def mostrar():
+            if not turma_combo.get():
+                messagebox.showwarning("Atenção", "Selecione uma turma.", parent=top)
+                return
+            turma = turma_combo.get()
+            self.em_segundo_plano(lambda cur, tarefa: self.alunos_em_risco(turma, cur=cur, tarefa=tarefa),
+                                  ao_concluir=exibir, descricao="Calculando notas necessárias", parent=top)
+
+        def exibir(risco):
+            if not top.winfo_exists(): return
+            linhas.reconciliar(
+                ((aluno_id, disciplina), (nome, disciplina, self.formatar_nota(media), self.formatar_nota(corte, 1), pendentes,
+                                          "Impossível" if necessaria == math.inf else self.formatar_nota(necessaria, 1)))
+                for aluno_id, nome, disciplina, media, pendentes, necessaria, corte in risco)
+
+        ttk.Button(filtros, text="Mostrar", command=mostrar).pack(side="left", padx=5)
+
+    def criterios_gui(self):
+        """ Regra de cálculo da média das disciplinas e critérios de aprovação/recuperação. """
+        top = tk.Toplevel(self.root)
+        top.title("Critérios de Avaliação")
+        top.geometry("480x620")
+        frame = ttk.Frame(top, padding=20, style="Content.TFrame")
+        frame.pack(expand=True, fill="both")
+
+        opcoes = {"Média simples": "simples", "Média ponderada (pesos)": "ponderada",
+                  "Descartar a menor nota": "descartar_menor", "Melhores N notas": "melhores"}
+        atual = self.politica_media.codigo.split(':')[0]
+        ttk.Label(frame, text="Como calcular a média de cada disciplina:").pack(pady=5)
+        combo = ttk.Combobox(frame, values=list(opcoes), state="readonly", width=35)
+        combo.set(next(rotulo for rotulo, codigo in opcoes.items() if codigo == atual))
+        combo.pack(pady=5)
+        ttk.Label(frame, text="N (apenas para 'Melhores N notas'):").pack(pady=5)
+        n_spin = ttk.Spinbox(frame, from_=1, to=20, width=5)
+        n_spin.set(getattr(self.politica_media, 'n', 0) or 2)
+        n_spin.pack(pady=5)
+
+        regras = self.regras_situacao
+        campos = {}
+        for chave, rotulo, valor in (
+                ("aprovacao", "Média para aprovação:", regras.aprovacao),
+                ("recuperacao", "Média para recuperação:", regras.recuperacao),
+                ("minimo", "Nota mínima em cada componente (vazio = sem mínimo):", regras.minimo_componente)):
+            ttk.Label(frame, text=rotulo).pack(pady=(10, 2))
+            campos[chave] = ttk.Entry(frame, width=10)
+            if valor is not None:
+                campos[chave].insert(0, self.formatar_nota(valor, 1))
+            campos[chave].pack()
+        ttk.Label(frame, text="Cortes por disciplina (um por linha: Disciplina; aprovação; recuperação):").pack(pady=(10, 2))
+        por_disciplina = tk.Text(frame, height=5, width=45)
+        for disciplina, (aprovacao, recuperacao) in regras.por_disciplina.items():
+            por_disciplina.insert(tk.END, f"{disciplina}; {self.formatar_nota(aprovacao, 1)}; "
+                                          f"{self.formatar_nota(recuperacao, 1)}\n")
+        por_disciplina.pack(pady=5)
+
+        def salvar():
+            codigo = opcoes[combo.get()]
+            if codigo == "melhores":
+                try:
+                    n = int(n_spin.get())
+                    if n < 1: raise ValueError
+                except ValueError:
+                    messagebox.showerror("Erro", "N deve ser um inteiro maior que zero.", parent=top)
+                    return
+                codigo = f"melhores:{n}"
+            try:
+                aprovacao = self.ler_nota(campos["aprovacao"].get())
+                recuperacao = self.ler_nota(campos["recuperacao"].get())
+                minimo = self.ler_nota(campos["minimo"].get()) if campos["minimo"].get().strip() else None
+                cortes = {}
+                for linha in por_disciplina.get("1.0", tk.END).splitlines():
+                    if not linha.strip(): continue
+                    disciplina, corte_aprovacao, corte_recuperacao = [p.strip() for p in linha.split(';')]
+                    cortes[disciplina.upper()] = (self.ler_nota(corte_aprovacao), self.ler_nota(corte_recuperacao))
+                if recuperacao > aprovacao or any(r > a for a, r in cortes.values()):
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Erro", "Critérios inválidos: use notas de 0 a 10, com a média de "
+                                     "recuperação menor ou igual à de aprovação.", parent=top)
+                return
+            def concluir():
+                messagebox.showinfo("Sucesso", f"Critérios salvos. Política de média: {self.politica_media.descricao}",
+                                    parent=top if top.winfo_exists() else self.root)
+                if top.winfo_exists(): top.destroy()
+
+            self.definir_criterios(codigo, RegrasSituacao(aprovacao, recuperacao, minimo, cortes), ao_concluir=concluir)
+
+        ttk.Button(frame, text="Salvar", command=salvar, style="Success.TButton").pack(pady=15)
 
     def get_selected_aluno_id(self):
-        try:
-            sel = self.tree.selection()[0]
-            return self.tree.item(sel)['values'][2]
-        except IndexError:
+        aluno_id = self.lista_alunos.selecionado
+        if aluno_id not in self.alunos:
             messagebox.showwarning("Atenção", "Selecione um aluno primeiro.")
             return None
-
-    def atualizar_lista_alunos(self):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-        for a_id, info in self.alunos.items():
-            self.tree.insert("", "end", values=(info['nome'], info['turma'], a_id))
+        return aluno_id
+
+    def atualizar_lista_alunos(self, novos=None, reler=False):
+        """
+        Refaz a ordem da lista, ou só acrescenta os alunos novos (IDs em novos) ao fim.
+        Com reler=True, as páginas já exibidas também são relidas (alunos alterados).
+        """
+        if novos is None:
+            self.ordem_alunos = list(self.alunos)
+            inicio = 0
+        else:
+            inicio = 0 if reler else len(self.ordem_alunos)
+            self.ordem_alunos.extend(novos)
+        if self.resultado_busca is not None:
+            self.resultado_busca = self.buscar_alunos(self.filtro_alunos)
+            inicio = 0
+        self.lista_alunos.atualizar(inicio)
+
+    def filtrar_lista_alunos(self, texto):
+        """ Mostra na lista só os alunos encontrados por texto (vazio: todos), a partir do topo. """
+        self.filtro_alunos = texto
+        self.resultado_busca = self.buscar_alunos(texto)
+        self.lista_alunos.inicio = 0
+        self.lista_alunos.atualizar()
+
+    def alunos_listados(self):
+        """ IDs exibidos na lista do menu: o resultado da busca ou todos os alunos. """
+        return self.ordem_alunos if self.resultado_busca is None else self.resultado_busca
+
+    def pagina_alunos(self, inicio, quantidade):
+        """ [(nome, turma, id)] dos alunos de inicio a inicio + quantidade, na ordem da lista. """
+        return [(self.alunos[aluno_id].nome, self.alunos[aluno_id].turma, aluno_id)
+                for aluno_id in self.alunos_listados()[inicio:inicio + quantidade]]
 
     # ======================================================
     # ADICIONAR ALUNO
@@ -262,17 +3013,40 @@ class GerenciadorNotasApp:
             if not dados['nome'] or not dados['turma']:
                 messagebox.showerror("Erro", "Nome e Turma são obrigatórios.")
                 return
-            novo_id = str(uuid.uuid4())[:8].upper()
-            self.cursor.execute("INSERT INTO alunos VALUES (?, ?, ?, ?, ?, ?)",
-                                 (novo_id, dados['nome'], dados['matricula'],
-                                  dados['data_nascimento'], dados['turma'], dados['contato']))
-            self.conexao.commit()
-            self.alunos[novo_id] = dados
-            self.atualizar_lista_alunos()
-            messagebox.showinfo("Sucesso", f"Aluno {dados['nome']} cadastrado!\nID: {novo_id}")
-            top.destroy()
 
-        ttk.Button(frame, text="Salvar", command=salvar).grid(columnspan=2, pady=20)
+            def concluir(novo_id):
+                self.atualizar_lista_alunos([novo_id])
+                messagebox.showinfo("Sucesso", f"Aluno {dados['nome']} cadastrado!\nID: {novo_id}")
+                top.destroy()
+
+            botao_salvar.state(["disabled"])  # Um segundo clique antes do commit cadastraria o aluno de novo
+            self.inserir_aluno(dados, concluir)
+
+        botao_salvar = ttk.Button(frame, text="Salvar", command=salvar)
+        botao_salvar.grid(columnspan=2, pady=20)
+
+    def importar_alunos_gui(self):
+        """ Importa uma lista de alunos de um CSV (nome;matricula;data_nascimento;turma;contato). """
+        filepath = filedialog.askopenfilename(
+            title="Importar Alunos",
+            filetypes=[("Arquivo CSV", "*.csv"), ("Todos os Arquivos", "*.*")],
+            parent=self.root
+        )
+        if not filepath: return
+
+        def gravar(leitura):
+            lista, ignorados = leitura
+            def concluir(ids):
+                if getattr(self, 'lista_alunos', None) and self.lista_alunos.tree.winfo_exists():
+                    self.atualizar_lista_alunos(ids)
+                msg = f"{len(ids)} alunos importados."
+                if ignorados:
+                    msg += f"\n{ignorados} linhas ignoradas (sem Nome ou Turma)."
+                messagebox.showinfo("Sucesso", msg)
+            self.importar_alunos(lista, ao_concluir=concluir)
+
+        self.em_segundo_plano(lambda cur, tarefa: ler_csv_alunos(filepath, tarefa),
+                              ao_concluir=gravar, descricao="Lendo arquivo de alunos")
 
     # ======================================================
     # ADICIONAR NOTAS (SEM PESO + PADRÃO)
@@ -280,7 +3054,7 @@ class GerenciadorNotasApp:
     def adicionar_notas_gui(self):
         aluno_id = self.get_selected_aluno_id()
         if not aluno_id: return
-        aluno_nome = self.alunos[aluno_id]['nome']
+        aluno_nome = self.alunos[aluno_id].nome
 
         top = tk.Toplevel(self.root)
         top.title(f"Notas de {aluno_nome}")
@@ -293,34 +3067,45 @@ class GerenciadorNotasApp:
         disciplina_entry = ttk.Entry(frame, width=40)
         disciplina_entry.pack(pady=5)
 
-        cols = ('Componente', 'Nota')
+        usa_peso = self.politica_media.usa_peso
+        cols = ('Componente', 'Nota', 'Peso') if usa_peso else ('Componente', 'Nota')
         tree = ttk.Treeview(frame, columns=cols, show='headings')
         for col in cols: tree.heading(col, text=col)
         tree.pack(expand=True, fill='both', pady=10)
 
-        # --- Componentes padrão automáticos ---
-        componentes_padrao = ["Trabalho 1", "Trabalho 2", "Teste", "Prova"]
-        for nome in componentes_padrao:
-            tree.insert("", "end", values=(nome, "0,0"))
+        # --- Componentes padrão automáticos (chave: nome em minúsculas) ---
+        componentes = ReconciliadorTreeview(tree)
+        for nome in COMPONENTES_PADRAO:
+            componentes.definir(nome.lower(), (nome, "0,0", 1) if usa_peso else (nome, "0,0"))
 
         ttk.Label(frame, text="Selecione um componente e digite a nova nota (0-10):").pack(pady=5)
         nota_entry = ttk.Entry(frame, width=10)
         nota_entry.pack(pady=5)
+        if usa_peso:
+            ttk.Label(frame, text="Peso (1-5, opcional):").pack(pady=5)
+            peso_entry = ttk.Entry(frame, width=10)
+            peso_entry.pack(pady=5)
 
         def atualizar_nota():
-            try:
-                sel = tree.selection()[0]
-            except IndexError:
+            chave = componentes.chave_selecionada()
+            if chave is None:
                 messagebox.showwarning("Aviso", "Selecione um componente.")
                 return
             try:
-                nova_nota = float(nota_entry.get().replace(',', '.')) 
-                if not (0 <= nova_nota <= 10): raise ValueError
+                nova_nota = self.ler_nota(nota_entry.get())
             except ValueError:
                 messagebox.showerror("Erro", "Nota inválida (deve ser um número entre 0 e 10).")
                 return
-            nome = tree.item(sel)['values'][0]
-            tree.item(sel, values=(nome, self.formatar_numero(nova_nota, 1))) 
+            valores = list(componentes.valores[chave])
+            valores[1] = self.formatar_nota(nova_nota, 1)
+            if usa_peso and peso_entry.get().strip():
+                try:
+                    valores[2] = self.ler_peso(peso_entry.get())
+                except ValueError:
+                    messagebox.showerror("Erro", "Peso inválido (deve ser um inteiro entre 1 e 5).")
+                    return
+                peso_entry.delete(0, tk.END)
+            componentes.definir(chave, valores)
             nota_entry.delete(0, tk.END)
 
         ttk.Button(frame, text="Atualizar Nota", command=atualizar_nota).pack(pady=5)
@@ -331,18 +3116,155 @@ class GerenciadorNotasApp:
                 messagebox.showerror("Erro", "Disciplina obrigatória.")
                 return
             comps = []
-            for item in tree.get_children():
-                nome, nota = tree.item(item)['values']
-                comps.append({"nome": nome, "nota": float(str(nota).replace(',', '.'))}) 
-
-            comp_json = json.dumps(comps)
-            self.cursor.execute("INSERT INTO notas (aluno_id, disciplina, componentes) VALUES (?, ?, ?)",
-                                 (aluno_id, disc, comp_json))
-            pk_id = self.cursor.lastrowid
-            self.conexao.commit()
-            self.notas.setdefault(aluno_id, []).append({"pk_id": pk_id, "disciplina": disc, "componentes": comps}) 
-            messagebox.showinfo("Sucesso", f"Notas de {disc} salvas!")
-            top.destroy()
+            for _, valores in componentes.linhas():
+                peso = valores[2] if usa_peso else 1
+                comps.append(Componente(valores[0], self.ler_nota(valores[1]), peso))
+
+
+            def concluir(_):
+                messagebox.showinfo("Sucesso", f"Notas de {disc} salvas!")
+                top.destroy()
+
+            botao_salvar.state(["disabled"])  # Um segundo clique antes do commit gravaria a disciplina de novo
+            self.inserir_notas(aluno_id, disc, comps, concluir)
+
+        botao_salvar = ttk.Button(frame, text="✅ Salvar Notas", command=salvar, style="Success.TButton")
+        botao_salvar.pack(pady=10)
+
+    # ======================================================
+    # NOTAS DA TURMA (GRADE)
+    # ======================================================
+    def lancar_notas_turma_gui(self):
+        """ Lançamento em grade: alunos da turma nas linhas, componentes da disciplina nas colunas. """
+        top = tk.Toplevel(self.root)
+        top.title("Notas da Turma")
+        top.geometry("900x650")
+        frame = ttk.Frame(top, padding=20, style="Content.TFrame")
+        frame.pack(expand=True, fill="both")
+
+        filtros = ttk.Frame(frame, style="Content.TFrame")
+        filtros.pack(fill="x", pady=5)
+        turmas = sorted({aluno.turma for aluno in self.alunos.values()})
+        ttk.Label(filtros, text="Turma:").pack(side="left", padx=5)
+        turma_combo = ttk.Combobox(filtros, values=turmas, state="readonly", width=12)
+        turma_combo.pack(side="left", padx=5)
+        ttk.Label(filtros, text="Disciplina:").pack(side="left", padx=5)
+        disciplina_entry = ttk.Entry(filtros, width=20)
+        disciplina_entry.pack(side="left", padx=5)
+
+        linha_componentes = ttk.Frame(frame, style="Content.TFrame")
+        linha_componentes.pack(fill="x", pady=5)
+        ttk.Label(linha_componentes, text="Componentes (separados por ;):").pack(side="left", padx=5)
+        componentes_entry = ttk.Entry(linha_componentes, width=50)
+        componentes_entry.insert(0, "; ".join(COMPONENTES_PADRAO))
+        componentes_entry.pack(side="left", padx=5)
+
+        ttk.Label(frame, text="Setas, Enter e Tab mudam de célula; Ctrl+V cola um bloco copiado de uma planilha.\n"
+                              "Só as células alteradas são gravadas; células vazias não gravam nota.").pack(anchor="w", pady=5)
+        rodape = ttk.Frame(frame, style="Content.TFrame")
+        rodape.pack(side="bottom", fill="x")
+        area = ttk.Frame(frame, style="Content.TFrame")
+        area.pack(expand=True, fill="both", pady=5)
+        estado = {}  # turma, disciplina, colunas, pesos, alunos e notas existentes da grade carregada
+
+        def carregar():
+            turma = turma_combo.get()
+            disc = disciplina_entry.get().strip().upper()
+            if not turma or not disc:
+                messagebox.showwarning("Atenção", "Selecione a turma e informe a disciplina.", parent=top)
+                return
+            alunos, existentes = self.notas_da_turma(turma, disc)
+
+            # Disciplina já lançada na turma: as colunas são os componentes gravados
+            colunas, pesos = [], {}
+            for item in existentes.values():
+                for c in item.componentes:
+                    if c.nome.lower() not in pesos:
+                        colunas.append(c.nome)
+                        pesos[c.nome.lower()] = c.peso
+            if colunas:
+                componentes_entry.delete(0, tk.END)
+                componentes_entry.insert(0, "; ".join(colunas))
+            else:
+                for nome in (n.strip() for n in componentes_entry.get().split(';')):
+                    if nome and nome.lower() not in pesos:
+                        colunas.append(nome)
+                        pesos[nome.lower()] = 1
+            if not colunas:
+                messagebox.showerror("Erro", "Informe ao menos um componente.", parent=top)
+                return
+
+            if "grade" in estado:
+                estado["grade"].frame.destroy()
+            grade = GradeNotas(area, [nome for _, nome in alunos], colunas, self.ler_nota,
+                               "Invalida.TEntry", self.BG_CONTAINER, pesos=self.politica_media.usa_peso)
+            for j, nome in enumerate(colunas):
+                if grade.pesos:
+                    grade.pesos[j].delete(0, tk.END)
+                    grade.pesos[j].insert(0, str(pesos[nome.lower()]))
+            for i, (aluno_id, _) in enumerate(alunos):
+                item = existentes.get(aluno_id)
+                if item is None:
+                    continue
+                notas = {c.nome.lower(): c.nota for c in item.componentes}
+                for j, nome in enumerate(colunas):
+                    nota = notas.get(nome.lower())
+                    if nota is not None:
+                        grade.definir(i, j, self.formatar_nota(nota, 1 if nota % 10 == 0 else 2))
+            grade.guardar_originais()
+            grade.pack(expand=True, fill="both")
+            estado.update(turma=turma, disciplina=disc, colunas=colunas, pesos=pesos,
+                          alunos=alunos, existentes=existentes, grade=grade)
+            grade.mover(0, 0)
+
+        def salvar():
+            grade = estado.get("grade")
+            if grade is None:
+                messagebox.showwarning("Atenção", "Carregue a turma primeiro.", parent=top)
+                return
+            for i in range(len(grade.celulas)):
+                for j in range(len(estado["colunas"])):
+                    grade.conferir(i, j)
+            invalida = grade.primeira_invalida()
+            if invalida:
+                messagebox.showerror("Erro", "Há notas inválidas (devem ser números entre 0 e 10).", parent=top)
+                grade.mover(*invalida)
+                return
+            disc, colunas = estado["disciplina"], estado["colunas"]
+            try:
+                # Componentes novos recebem o peso da coluna (na tela ou o já gravado na turma)
+                if grade.pesos:
+                    peso_padrao = {j: self.ler_peso(entry.get()) for j, entry in enumerate(grade.pesos)}
+                else:
+                    peso_padrao = {j: estado["pesos"][nome.lower()] for j, nome in enumerate(colunas)}
+                pesos = {j: self.ler_peso(texto) for j, texto in grade.pesos_alterados().items()}
+            except ValueError:
+                messagebox.showerror("Erro", "Peso inválido (deve ser um inteiro entre 1 e 5).", parent=top)
+                return
+            notas = {}
+            for i in range(len(estado["alunos"])):
+                alteradas = {j: self.ler_nota(texto) for j, texto in grade.alteradas(i).items() if texto.strip()}
+                if alteradas:
+                    notas[i] = alteradas
+            novos, alteracoes = lancamentos_da_grade(disc, estado["alunos"], estado["existentes"],
+                                                     colunas, notas, pesos, peso_padrao)
+            if not novos and not alteracoes:
+                messagebox.showinfo("Aviso", "Nenhuma nota foi alterada.", parent=top)
+                return
+
+
+            def concluir(_):
+                parent = top if top.winfo_exists() else self.root
+                messagebox.showinfo("Sucesso", f"Notas de {disc} gravadas para {len(novos) + len(alteracoes)} aluno(s) "
+                                               f"da turma {estado['turma']}.", parent=parent)
+                top.destroy()
+
+            botao_salvar.state(["disabled"])  # Um segundo clique antes do commit gravaria a turma de novo
+            self.salvar_notas_lote(novos, alteracoes, concluir)
+
+        ttk.Button(filtros, text="Carregar", command=carregar).pack(side="left", padx=5)
+        botao_salvar = ttk.Button(rodape, text="✅ Salvar Notas da Turma", command=salvar, style="Success.TButton")
+        botao_salvar.pack(pady=10)
 
     # ======================================================
     # EDITAR NOTAS
@@ -351,9 +3273,9 @@ class GerenciadorNotasApp:
         """ Mostra as disciplinas do aluno selecionado para edição. """
         aluno_id = self.get_selected_aluno_id()
         if not aluno_id: return
-        aluno_nome = self.alunos[aluno_id]['nome']
-        self.carregar_dados() # Recarrega para ter certeza de ter os dados mais recentes
-        notas_aluno = self.notas.get(aluno_id, [])
+        aluno_nome = self.alunos[aluno_id].nome
+        self.sincronizar_alteracoes() # Traz só o que mudou desde a última leitura
+        notas_aluno = self.obter_notas(aluno_id)
 
         if not notas_aluno:
              messagebox.showinfo("Aviso", f"{aluno_nome} não tem notas cadastradas para edição.")
@@ -373,21 +3295,17 @@ class GerenciadorNotasApp:
         for col in cols: tree.heading(col, text=col)
         tree.pack(expand=True, fill='both', pady=10)
 
-        tree_map = {} 
-        for item in notas_aluno:
-            media = self.calcular_media_por_disciplina(item)
-            media_str = self.formatar_numero(media)
-            tree_id = tree.insert("", "end", values=(item['disciplina'], media_str))
-            tree_map[tree_id] = item 
-            
+        disciplinas = ReconciliadorTreeview(tree)  # chave: pk_id
+        disciplinas.reconciliar((item.pk_id, (item.disciplina, self.formatar_nota(self.media_disciplina(aluno_id, item))))
+                                for item in notas_aluno)
+        itens = {item.pk_id: item for item in notas_aluno}
 
         def abrir_edicao():
-            try:
-                sel = tree.selection()[0]
-                disciplina_item = tree_map[sel]
-            except IndexError:
+            pk_id = disciplinas.chave_selecionada()
+            if pk_id is None:
                 messagebox.showwarning("Aviso", "Selecione uma disciplina.")
                 return
+            disciplina_item = itens[pk_id]
             
             self.editar_notas_disciplina_top_level(aluno_id, disciplina_item, top)
 
@@ -397,9 +3315,9 @@ class GerenciadorNotasApp:
     def editar_notas_disciplina_top_level(self, aluno_id, disciplina_item, parent_window):
         """ Abre a interface para editar os componentes de nota de uma disciplina. """
         
-        pk_id = disciplina_item['pk_id']
-        disciplina = disciplina_item['disciplina']
-        aluno_nome = self.alunos[aluno_id]['nome']
+        pk_id = disciplina_item.pk_id
+        disciplina = disciplina_item.disciplina
+        aluno_nome = self.alunos[aluno_id].nome
         
         top = tk.Toplevel(self.root)
         top.title(f"Editar Notas e Componentes de {disciplina} - {aluno_nome}")
@@ -411,14 +3329,17 @@ class GerenciadorNotasApp:
         ttk.Label(frame, text=f"Editando: **{disciplina}**", 
                   style="Header.TLabel", foreground=self.ACCENT_COLOR).pack(pady=10, fill='x')
 
-        cols = ('Componente', 'Nota')
+        usa_peso = self.politica_media.usa_peso
+        cols = ('Componente', 'Nota', 'Peso') if usa_peso else ('Componente', 'Nota')
         tree = ttk.Treeview(frame, columns=cols, show='headings')
         for col in cols: tree.heading(col, text=col)
         tree.pack(expand=True, fill='both', pady=10)
         
-        # Preenche com as notas atuais
-        for comp in disciplina_item['componentes']:
-            tree.insert("", "end", values=(comp['nome'], self.formatar_numero(comp['nota'], 1)))
+        # Preenche com as notas atuais (chave: nome em minúsculas)
+        componentes = ReconciliadorTreeview(tree)
+        componentes.reconciliar(
+            (comp.nome.lower(), (comp.nome, self.formatar_nota(comp.nota, 1)) + ((comp.peso,) if usa_peso else ()))
+            for comp in disciplina_item.componentes)
 
 
         # --- Seção para Edição e Atualização de Notas ---
@@ -428,21 +3349,31 @@ class GerenciadorNotasApp:
         ttk.Label(update_frame, text="Selecione e mude a nota (0-10):").pack(side="left", padx=5)
         nota_entry = ttk.Entry(update_frame, width=10)
         nota_entry.pack(side="left", padx=5)
+        if usa_peso:
+            ttk.Label(update_frame, text="Peso (1-5):").pack(side="left", padx=5)
+            peso_entry = ttk.Entry(update_frame, width=5)
+            peso_entry.pack(side="left", padx=5)
 
         def atualizar_nota():
-            try:
-                sel = tree.selection()[0]
-            except IndexError:
+            chave = componentes.chave_selecionada()
+            if chave is None:
                 messagebox.showwarning("Aviso", "Selecione um componente.")
                 return
             try:
-                nova_nota = float(nota_entry.get().replace(',', '.'))
-                if not (0 <= nova_nota <= 10): raise ValueError
+                nova_nota = self.ler_nota(nota_entry.get())
             except ValueError:
                 messagebox.showerror("Erro", "Nota inválida (deve ser um número entre 0 e 10).")
                 return
-            nome = tree.item(sel)['values'][0]
-            tree.item(sel, values=(nome, self.formatar_numero(nova_nota, 1)))
+            valores = list(componentes.valores[chave])
+            valores[1] = self.formatar_nota(nova_nota, 1)
+            if usa_peso and peso_entry.get().strip():
+                try:
+                    valores[2] = self.ler_peso(peso_entry.get())
+                except ValueError:
+                    messagebox.showerror("Erro", "Peso inválido (deve ser um inteiro entre 1 e 5).")
+                    return
+                peso_entry.delete(0, tk.END)
+            componentes.definir(chave, valores)
             nota_entry.delete(0, tk.END)
 
         ttk.Button(update_frame, text="Atualizar Nota", command=atualizar_nota).pack(side="left", padx=10)
@@ -462,29 +3393,27 @@ class GerenciadorNotasApp:
                 return
             
             # --- Melhoria: Verifica se já existe um componente (Case-insensitive) ---
-            componentes_existentes = [tree.item(item)['values'][0].lower() for item in tree.get_children()]
-            if novo_nome.lower() in componentes_existentes:
+            if novo_nome.lower() in componentes:
                 messagebox.showwarning("Aviso", f"O componente '{novo_nome}' já existe. Use um nome diferente.")
                 return
 
-            tree.insert("", "end", values=(novo_nome, "0,0"))
+            componentes.definir(novo_nome.lower(), (novo_nome, "0,0", 1) if usa_peso else (novo_nome, "0,0"))
             novo_comp_entry.delete(0, tk.END)
             # Retorna uma mensagem de sucesso mais sutil
             # messagebox.showinfo("Sucesso", f"Componente '{novo_nome}' adicionado. Salve para confirmar.")
             
         def remover_componente():
-            try:
-                sel = tree.selection()[0]
-            except IndexError:
+            chave = componentes.chave_selecionada()
+            if chave is None:
                 messagebox.showwarning("Aviso", "Selecione um componente para remover.")
                 return
             
-            nome_comp = tree.item(sel)['values'][0]
+            nome_comp = componentes.valores[chave][0]
             
             if messagebox.askyesno("Confirmar Remoção", 
                                    f"Tem certeza que deseja remover o componente '{nome_comp}'?\n\nIsto removerá a nota associada **após o salvamento**.", 
                                    parent=top):
-                tree.delete(sel)
+                componentes.remover(chave)
                 # Não precisa de messagebox de sucesso, pois o usuário verá a remoção imediata.
 
         ttk.Button(comp_frame, text="➕ Adicionar Componente", command=adicionar_componente).pack(side="left", padx=10)
@@ -496,31 +3425,25 @@ class GerenciadorNotasApp:
             novos_comps = []
             
             # Garante que haja pelo menos um componente antes de salvar
-            if not tree.get_children():
+            if not componentes:
                 messagebox.showwarning("Aviso", "A disciplina deve ter pelo menos um componente de nota. Adicione um componente antes de salvar.")
                 return
                 
-            for item in tree.get_children():
-                nome, nota_str = tree.item(item)['values']
-                nova_nota = float(str(nota_str).replace(',', '.'))
-                novos_comps.append({"nome": nome, "nota": nova_nota})
-
-            novo_comp_json = json.dumps(novos_comps)
-            
-            # Atualiza o banco de dados
-            self.cursor.execute("UPDATE notas SET componentes = ? WHERE pk_id = ?",
-                                 (novo_comp_json, pk_id))
-            self.conexao.commit()
-            
-            # Atualiza os dados em memória (self.notas)
-            for i, item in enumerate(self.notas.get(aluno_id, [])):
-                if item.get('pk_id') == pk_id:
-                    self.notas[aluno_id][i]['componentes'] = novos_comps
-                    break
-            
-            messagebox.showinfo("Sucesso", f"Notas e Componentes de {disciplina} atualizados!")
-            top.destroy()
-            parent_window.destroy()
+            # Mantém o peso dos componentes que já existiam (bancos migrados do 3.x/4.0)
+            pesos = {c.nome: c.peso for c in disciplina_item.componentes}
+            for _, valores in componentes.linhas():
+                nome = valores[0]
+                nova_nota = self.ler_nota(valores[1])
+                peso = valores[2] if usa_peso else pesos.get(nome, 1)
+                novos_comps.append(Componente(nome, nova_nota, peso))
+
+            def concluir(_):
+                messagebox.showinfo("Sucesso", f"Notas e Componentes de {disciplina} atualizados!")
+                top.destroy()
+                parent_window.destroy()
+
+            # Atualiza o banco de dados e os dados em memória (self.notas) sem travar a janela
+            self.atualizar_componentes(aluno_id, pk_id, novos_comps, concluir)
 
         ttk.Button(frame, text="✅ Salvar Edição", command=salvar_edicao, style="Success.TButton").pack(pady=20)
         ttk.Button(frame, text="Cancelar", command=top.destroy).pack(pady=5)
@@ -529,31 +3452,67 @@ class GerenciadorNotasApp:
     # ======================================================
     # CÁLCULOS E VISUALIZAÇÃO
     # ======================================================
+    def ler_peso(self, texto):
+        """ Peso de componente digitado pelo professor: inteiro de 1 a 5, como no ENOTE 3.x. """
+        peso = int(texto.strip())
+        if not (1 <= peso <= 5): raise ValueError
+        return peso
+
     def calcular_media_por_disciplina(self, nota_item):
-        notas = [c.get('nota', 0) for c in nota_item['componentes']]
-        return sum(notas) / len(notas) if notas else 0.0 
+        """ Média da disciplina segundo a política de média ativa. """
+        comps = nota_item.componentes
+        return self.politica_media.calcular([c.nota for c in comps], [c.peso for c in comps])
+
+    def calcular_media_geral(self, medias):
+        """ Média geral do aluno a partir das médias por disciplina. """
+        return dividir_arredondado(sum(medias), len(medias)) if medias else 0
+
+    def media_disciplina(self, aluno_id, nota_item):
+        """ calcular_media_por_disciplina com memorização por aluno_id/pk_id. """
+        return self.memo_medias.obter(aluno_id, nota_item.pk_id,
+                                      partial(self.calcular_media_por_disciplina, nota_item))
+
+    def situacao_disciplina(self, aluno_id, nota_item):
+        """ Situação da disciplina segundo as regras ativas (RegrasSituacao). """
+        return self.regras_situacao.avaliar(nota_item.disciplina, self.media_disciplina(aluno_id, nota_item),
+                                            [c.nota for c in nota_item.componentes])
+
+    def situacao_aluno(self, aluno_id):
+        """ Situação geral do aluno: a pior entre as disciplinas. """
+        return self.regras_situacao.situacao_geral(
+            [self.situacao_disciplina(aluno_id, n) for n in self.obter_notas(aluno_id)])
+
+    def media_aluno(self, aluno_id):
+        """ Média geral do aluno com memorização (reaproveita as médias por disciplina memorizadas). """
+        def calcular():
+            return self.calcular_media_geral([self.media_disciplina(aluno_id, n) for n in self.obter_notas(aluno_id)])
+        return self.memo_medias.obter(aluno_id, None, calcular)
 
     def calcular_media_gui(self, aluno_id=None, show_message=True):
         aluno_id = aluno_id or self.get_selected_aluno_id()
         if not aluno_id: return "0,00"
-        aluno = self.alunos[aluno_id]['nome']
-        notas_aluno = self.notas.get(aluno_id, [])
+        aluno = self.alunos[aluno_id].nome
+        notas_aluno = self.obter_notas(aluno_id)
         if not notas_aluno:
             if show_message: messagebox.showinfo("Aviso", f"{aluno} não tem notas.")
             return "0,00"
-        medias = [self.calcular_media_por_disciplina(n) for n in notas_aluno]
-        media_final = sum(medias) / len(medias) if medias else 0.0 
-        media_str = self.formatar_numero(media_final)
+        media_final = self.media_aluno(aluno_id)
+        media_str = self.formatar_nota(media_final)
         if show_message:
-            status = "APROVADO" if media_final >= 6 else "REPROVADO"
-            messagebox.showinfo("Média", f"Média Final: {media_str}\nStatus: {status}")
+            status = self.situacao_aluno(aluno_id).upper()
+            mensagem = f"Média Final: {media_str}\nStatus: {status}"
+            classificacao = self.posicao_aluno(aluno_id)
+            if classificacao:
+                posicao, total, _ = classificacao
+                mensagem += f"\nPosição na turma: {posicao}º de {total}"
+            messagebox.showinfo("Média", mensagem)
         return media_str
 
     def visualizar_notas_gui(self, aluno_id_param=None):
         aluno_id = aluno_id_param or self.get_selected_aluno_id()
         if not aluno_id: return
-        aluno_nome = self.alunos[aluno_id]['nome']
-        notas_aluno = self.notas.get(aluno_id, [])
+        aluno_nome = self.alunos[aluno_id].nome
+        notas_aluno = self.obter_notas(aluno_id)
 
         top = tk.Toplevel(self.root)
         top.title(f"Boletim - {aluno_nome}")
@@ -564,14 +3523,15 @@ class GerenciadorNotasApp:
 
         ttk.Label(frame, text=f"Boletim de {aluno_nome}", style="Header.TLabel").pack(pady=10, fill='x')
 
-        cols = ('Disciplina', 'Média')
+        cols = ('Disciplina', 'Média', 'Situação')
         tree = ttk.Treeview(frame, columns=cols, show='headings')
         for col in cols: tree.heading(col, text=col)
         tree.pack(expand=True, fill='both')
 
         for item in notas_aluno:
-            media = self.calcular_media_por_disciplina(item)
-            tree.insert("", "end", values=(item['disciplina'], self.formatar_numero(media)))
+            media = self.media_disciplina(aluno_id, item)
+            tree.insert("", "end", values=(item.disciplina, self.formatar_nota(media),
+                                           self.situacao_disciplina(aluno_id, item)))
 
         # --- FUNÇÃO DE EXPORTAR ---
         def exportar_para_impressao():
@@ -616,14 +3576,16 @@ class GerenciadorNotasApp:
                         <tr>
                             <th>Disciplina</th>
                             <th>Média</th>
+                            <th>Situação</th>
                         </tr>
                     </thead>
                     <tbody>
             """
             for item in notas_aluno:
-                media = self.calcular_media_por_disciplina(item)
-                media_str = self.formatar_numero(media)
-                html += f"<tr><td>{item['disciplina']}</td><td>{media_str}</td></tr>\n"
+                media = self.media_disciplina(aluno_id, item)
+                media_str = self.formatar_nota(media)
+                situacao = self.situacao_disciplina(aluno_id, item)
+                html += f"<tr><td>{item.disciplina}</td><td>{media_str}</td><td>{situacao}</td></tr>\n"
             media_total_str = self.calcular_media_gui(aluno_id=aluno_id, show_message=False)
             html += f"""
                     </tbody>
@@ -631,6 +3593,7 @@ class GerenciadorNotasApp:
                         <tr>
                             <th>Média Geral:</th>
                             <th>{media_total_str}</th>
+                            <th>{self.situacao_aluno(aluno_id) or ""}</th>
                         </tr>
                     </tfoot>
                 </table>
@@ -641,13 +3604,13 @@ class GerenciadorNotasApp:
             </body>
             </html>
             """
-            try:
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(html)
+            def concluir(_):
                 webbrowser.open(f'file://{os.path.realpath(filepath)}')
-                messagebox.showinfo("Sucesso", "Boletim exportado!\n\nO arquivo foi aberto no seu navegador. Use a função de impressão (Ctrl+P) do navegador.", parent=top)
-            except Exception as e:
-                messagebox.showerror("Erro", f"Não foi possível salvar o arquivo: {e}", parent=top)
+                messagebox.showinfo("Sucesso", "Boletim exportado!\n\nO arquivo foi aberto no seu navegador. Use a função de impressão (Ctrl+P) do navegador.",
+                                    parent=top if top.winfo_exists() else self.root)
+
+            self.em_segundo_plano(lambda cur, tarefa: salvar_arquivo(filepath, html), ao_concluir=concluir,
+                                  descricao="Salvando o boletim", parent=top)
         
         # --- FIM DA FUNÇÃO DE EXPORTAR ---
 
@@ -664,17 +3627,21 @@ class GerenciadorNotasApp:
         frame = ttk.Frame(self.root, style="Content.TFrame", padding=60)
         frame.place(relx=0.5, rely=0.5, anchor='center')
 
-        ttk.Label(frame, text="Digite seu ID:", font=('Inter', 14, 'bold'),
+        ttk.Label(frame, text="Digite seu ID ou matrícula:", font=('Inter', 14, 'bold'),
                   background=self.BG_CONTAINER).pack(pady=10)
         entry = ttk.Entry(frame, width=30, justify="center")
         entry.pack(pady=5)
 
         def acessar():
-            aluno_id = entry.get().strip().upper()
-            if aluno_id in self.alunos:
+            if self.carregando_alunos:
+                messagebox.showinfo("Aguarde", "A lista de alunos ainda está sendo carregada.")
+                return
+            # Só ID ou matrícula exatos: o aluno não pode procurar o boletim dos colegas pelo nome
+            aluno_id = self.localizar_aluno(entry.get())
+            if aluno_id:
                 self.visualizar_notas_gui(aluno_id_param=aluno_id)
             else:
-                messagebox.showerror("Erro", "ID inválido.")
+                messagebox.showerror("Erro", "ID ou matrícula inválidos.")
 
         ttk.Button(frame, text="Acessar Boletim", command=acessar).pack(pady=15)
         ttk.Button(frame, text="⬅️ Voltar", command=self.show_main_menu).pack(pady=10)
@@ -682,7 +3649,88 @@ class GerenciadorNotasApp:
 # ======================================================
 # EXECUÇÃO
 # ======================================================
+def linha_de_comando(argumentos):
+    """
+    Consultas sem abrir a janela, para scripts. Ex.:
+    python enote4.4.py --piores 50            (as 50 menores médias da escola)
+    python enote4.4.py --melhores 10 --turma 3A
+    python enote4.4.py --melhor-por-turma
+    python enote4.4.py --medias-disciplinas --turma 3A
+    python enote4.4.py --abaixo-de 6 --turma 3A  (médias gerais abaixo de 6,0)
+    python enote4.4.py --abaixo-de 6 --turma 3A --recalcular  (idem, recalculadas pelos componentes)
+    Lê as médias gravadas (--medias-disciplinas e --recalcular calculam pelos componentes, com a
+    política de média salva no banco); o banco precisa já ter sido aberto uma vez pelo ENOTE desta versão.
+    """
+    def nota(texto):
+        try:
+            return ler_centesimos(texto)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"nota inválida: {texto} (use um número de 0 a 10)")
+
+    parser = argparse.ArgumentParser(description="Consultas do ENOTE sem interface gráfica.")
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--melhores", type=int, metavar="N", help="as N maiores médias")
+    grupo.add_argument("--piores", type=int, metavar="N", help="as N menores médias")
+    grupo.add_argument("--melhor-por-turma", action="store_true", help="a maior média de cada turma")
+    grupo.add_argument("--medias-disciplinas", action="store_true", help="a média de cada disciplina")
+    grupo.add_argument("--abaixo-de", type=nota, metavar="NOTA", help="médias gerais abaixo de NOTA (0 a 10)")
+    parser.add_argument("--turma", help="só esta turma")
+    # Disciplinas são gravadas em maiúsculas (ex.: "MAT")
+    parser.add_argument("--disciplina", type=lambda texto: texto.strip().upper(),
+                        help="média da disciplina em vez da média geral")
+    parser.add_argument("--recalcular", action="store_true",
+                        help="com --abaixo-de, calcula as médias pelos componentes em vez de ler as gravadas")
+    parser.add_argument("--banco", default=CAMINHO_BANCO, help="arquivo do banco (padrão: %(default)s)")
+    args = parser.parse_args(argumentos)
+    for opcao, n in (("--melhores", args.melhores), ("--piores", args.piores)):
+        if n is not None and n < 1:
+            parser.error(f"{opcao}: N deve ser pelo menos 1")
+    if args.recalcular and args.abaixo_de is None:
+        parser.error("--recalcular só vale com --abaixo-de")
+
+    try:
+        conexao = sqlite3.connect(f"file:{args.banco}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        print(f"Não foi possível abrir o banco {args.banco}: {e}", file=sys.stderr)
+        return 1
+    try:
+        cursor = conexao.cursor()
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] != GerenciadorNotasApp.VERSAO_SCHEMA:
+            print("O banco está em outra versão do esquema. Abra o ENOTE uma vez para atualizá-lo.", file=sys.stderr)
+            return 1
+        if args.melhor_por_turma:
+            for turma, aluno_id, nome, media in melhores_por_turma_sql(cursor):
+                print(f"{turma}\t{aluno_id}\t{nome}\t{formatar_centesimos(media)}")
+        elif args.medias_disciplinas or args.recalcular:
+            cursor.execute("SELECT valor FROM config WHERE chave = 'politica_media'")
+            row = cursor.fetchone()
+            politica = criar_politica_media(row[0] if row else None)
+            if args.medias_disciplinas:
+                for disciplina, media in medias_por_disciplina_sql(cursor, politica, args.turma):
+                    print(f"{disciplina}\t{formatar_centesimos(media)}")
+            else:
+                for aluno_id, nome, turma, media in medias_alunos_sql(cursor, politica, args.turma, args.abaixo_de):
+                    print(f"{aluno_id}\t{nome}\t{turma}\t{formatar_centesimos(media)}")
+        elif args.abaixo_de is not None:
+            for aluno_id, nome, turma, media in abaixo_da_media_sql(cursor, args.abaixo_de, args.turma):
+                print(f"{aluno_id}\t{nome}\t{turma}\t{formatar_centesimos(media)}")
+        else:
+            n = args.melhores if args.melhores is not None else args.piores
+            linhas = extremos_sql(cursor, n, args.turma, args.disciplina, piores=args.piores is not None)
+            for aluno_id, nome, turma, media in linhas:
+                print(f"{aluno_id}\t{nome}\t{turma}\t{formatar_centesimos(media)}")
+    except sqlite3.Error as e:
+        print(f"Não foi possível ler o banco {args.banco}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        conexao.close()
+    return 0
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(linha_de_comando(sys.argv[1:]))
     root = tk.Tk()
     app = GerenciadorNotasApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.fechar()
\ No newline at end of file
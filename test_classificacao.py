@@ -0,0 +1,71 @@
+"""
+Confere a classificação por turma (IndiceRanking) com alunos gravados por outra instância
+do ENOTE no mesmo banco, que ainda não estão na memória desta.
+Rodar com: python -m pytest test_classificacao.py  (ou python -m unittest test_classificacao)
+"""
+import os
+import tempfile
+import unittest
+
+from apoio_testes import criar_app, enote, esperar_tarefas, fechar
+
+
+class TestClassificacao(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.caminho = os.path.join(self.pasta, "enote.db")
+        self.app = criar_app(self.caminho)
+        ids = self.app.importar_alunos([{"nome": f"Aluno {i}", "turma": "T1"} for i in range(3)])
+        self.app.salvar_notas_lote([(aluno_id, "MAT", [enote.Componente("AV1", 500 + 100 * i)])
+                                    for i, aluno_id in enumerate(ids)])
+
+    def tearDown(self):
+        fechar(self.app)
+        for nome in os.listdir(self.pasta):
+            os.remove(os.path.join(self.pasta, nome))
+        os.rmdir(self.pasta)
+
+    def gravar_em_outra_instancia(self):
+        """ Aluno com a maior média da T1, gravado por outra conexão. """
+        outra = criar_app(self.caminho)
+        aluno_id = outra.importar_alunos([{"nome": "Aluno de fora", "turma": "T1"}])[0]
+        outra.salvar_notas_lote([(aluno_id, "MAT", [enote.Componente("AV1", enote.NOTA_MAXIMA)])])
+        fechar(outra)
+        self.assertNotIn(aluno_id, self.app.alunos)
+        return aluno_id
+
+    def test_media_geral(self):
+        aluno_id = self.gravar_em_outra_instancia()
+        linhas = self.app.classificacao("T1", 10)
+        self.assertEqual([(posicao, media) for _, posicao, _, _, media, _ in linhas],
+                         [(1, 1000), (2, 700), (3, 600), (4, 500)])
+        self.assertEqual(linhas[0][2:4], (aluno_id, "Aluno de fora"))
+
+    def test_disciplina(self):
+        aluno_id = self.gravar_em_outra_instancia()
+        linhas = self.app.classificacao("T1", 2, "MAT", piores=True)
+        self.assertEqual([nome for _, _, _, nome, _, _ in linhas], ["Aluno 0", "Aluno 1"])
+        ident, posicao, primeiro, nome, media, percentil = self.app.classificacao("T1", 1, "MAT")[0]
+        self.assertEqual((posicao, primeiro, nome, media), (1, aluno_id, "Aluno de fora", 1000))
+        self.assertEqual(ident[0], aluno_id)
+
+    def test_gravacao_sem_esperar(self):
+        """ Com ao_concluir, a nota é gravada fora da thread do Tk e a memória só muda depois do commit. """
+        aluno_id = self.gravar_em_outra_instancia()
+        self.app.classificacao("T1", 1)  # Ranking montado antes: a gravação precisa atualizá-lo
+        [ultimo] = [a for a in self.app.alunos if self.app.alunos[a].nome == "Aluno 0"]
+        gravados = []
+        retorno = self.app.salvar_notas_lote([(ultimo, "POR", [enote.Componente("AV1", enote.NOTA_MAXIMA)])],
+                                             ao_concluir=gravados.append)
+        self.assertIsNone(retorno)
+        esperar_tarefas(self.app)
+        self.assertEqual(len(gravados), 1)
+        self.assertEqual([pk for pk, in self.app.cursor.execute("SELECT pk_id FROM notas WHERE disciplina = 'POR'")],
+                         gravados[0])
+        # Média geral do Aluno 0 passa de 5,00 para 7,50; o aluno de fora continua em primeiro
+        linhas = self.app.classificacao("T1", 2)
+        self.assertEqual([(aluno, media) for _, _, aluno, _, media, _ in linhas], [(aluno_id, 1000), (ultimo, 750)])
+
+
+if __name__ == "__main__":
+    unittest.main()
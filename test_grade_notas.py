@@ -0,0 +1,61 @@
+"""
+Confere o que a grade de notas da turma grava (lancamentos_da_grade): só as células e os pesos
+alterados, sem mexer nos demais componentes e pesos de cada aluno.
+Rodar com: python -m pytest test_grade_notas.py  (ou python -m unittest test_grade_notas)
+"""
+import unittest
+
+from apoio_testes import enote
+
+C = enote.Componente
+COLUNAS = ["AV1", "AV2", "Trabalho"]
+ALUNOS = [("A1", "Ana"), ("A2", "Bruno"), ("A3", "Carla")]
+PESO_PADRAO = {0: 1, 1: 1, 2: 1}
+
+
+def existentes():
+    """ Ana tem pesos próprios e só dois componentes; Bruno tem os três; Carla não tem a disciplina. """
+    return {"A1": enote.NotaDisciplina(10, "MAT", [C("AV1", 800, 3), C("av2", 800, 2)]),
+            "A2": enote.NotaDisciplina(11, "MAT", [C("AV1", 500), C("AV2", 700), C("Trabalho", 900), C("Extra", 1000)])}
+
+
+def como_tuplas(comps):
+    return [(c.nome, c.nota, c.peso) for c in comps]
+
+
+class TestGradeNotas(unittest.TestCase):
+    def lancar(self, notas=None, pesos=None):
+        return enote.lancamentos_da_grade("MAT", ALUNOS, existentes(), COLUNAS, notas or {}, pesos or {}, PESO_PADRAO)
+
+    def test_salvar_sem_alterar_nada(self):
+        self.assertEqual(self.lancar(), ([], []))
+
+    def test_so_o_aluno_alterado(self):
+        lancamentos, alteracoes = self.lancar({1: {2: 650}})
+        self.assertEqual(lancamentos, [])
+        [(aluno_id, pk_id, comps)] = alteracoes
+        self.assertEqual((aluno_id, pk_id), ("A2", 11))
+        self.assertEqual(como_tuplas(comps), [("AV1", 500, 1), ("AV2", 700, 1), ("Trabalho", 650, 1), ("Extra", 1000, 1)])
+
+    def test_mantem_pesos_e_nao_cria_zeros(self):
+        _, [(_, _, comps)] = self.lancar({0: {0: 900}})
+        self.assertEqual(como_tuplas(comps), [("AV1", 900, 3), ("av2", 800, 2)])
+
+    def test_mesma_nota_nao_grava(self):
+        self.assertEqual(self.lancar({0: {0: 800}}), ([], []))
+
+    def test_aluno_novo(self):
+        lancamentos, alteracoes = self.lancar({2: {1: 750}})
+        self.assertEqual(alteracoes, [])
+        [(aluno_id, disciplina, comps)] = lancamentos
+        self.assertEqual((aluno_id, disciplina, como_tuplas(comps)), ("A3", "MAT", [("AV2", 750, 1)]))
+
+    def test_peso_alterado(self):
+        lancamentos, alteracoes = self.lancar(pesos={0: 4})
+        self.assertEqual(lancamentos, [])  # Carla continua sem a disciplina
+        self.assertEqual({aluno_id: como_tuplas(comps)[0] for aluno_id, _, comps in alteracoes},
+                         {"A1": ("AV1", 800, 4), "A2": ("AV1", 500, 4)})
+
+
+if __name__ == "__main__":
+    unittest.main()
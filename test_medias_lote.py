@@ -0,0 +1,75 @@
+"""
+Confere que o cálculo em lote (ArmazemColunar.calcular_medias) dá exatamente as mesmas
+médias que o cálculo aluno a aluno da tela, para cada política de média.
+Rodar com: python -m pytest test_medias_lote.py  (ou python -m unittest test_medias_lote)
+"""
+import os
+import random
+import tempfile
+import unittest
+
+from apoio_testes import criar_app, enote, fechar
+
+POLITICAS = ["simples", "ponderada", "descartar_menor", "melhores:2"]
+
+
+def criar_app_com_notas(caminho):
+    """ App num banco novo com notas aleatórias. """
+    app = criar_app(caminho)
+    sorteio = random.Random(44)
+    for i in range(150):
+        app.cursor.execute("INSERT INTO alunos (id, nome, turma) VALUES (?, ?, ?)", (f"A{i}", f"Aluno {i}", f"T{i % 7}"))
+        for disciplina in sorteio.sample(["MAT", "POR", "HIS", "GEO", "ING"], sorteio.randint(1, 5)):
+            app.cursor.execute("INSERT INTO notas (aluno_id, disciplina, componentes) VALUES (?, ?, '[]')",
+                               (f"A{i}", disciplina))
+            comps = [enote.Componente(f"P{o}", sorteio.choice([0, enote.NOTA_MAXIMA, sorteio.randint(0, enote.NOTA_MAXIMA)]),
+                                      sorteio.randint(1, 5))
+                     for o in range(sorteio.randint(0, 6))]  # inclui disciplina sem componentes
+            app.salvar_componentes(app.cursor, app.cursor.lastrowid, comps)
+    app.conexao.commit()
+    return app
+
+
+class TestMediasLote(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pasta = tempfile.mkdtemp()
+        cls.app = criar_app_com_notas(os.path.join(cls.pasta, "enote.db"))
+
+    @classmethod
+    def tearDownClass(cls):
+        fechar(cls.app)
+        for nome in os.listdir(cls.pasta):
+            os.remove(os.path.join(cls.pasta, nome))
+        os.rmdir(cls.pasta)
+
+    def test_igual_ao_calculo_da_tela(self):
+        app = self.app
+        for codigo in POLITICAS:
+            with self.subTest(politica=codigo):
+                app.politica_media = enote.criar_politica_media(codigo)
+                lote = enote.ArmazemColunar.carregar(app.conexao.cursor()).calcular_medias(app.politica_media)
+                for aluno_id, media in lote['aluno'].items():
+                    notas = app.obter_notas(aluno_id)
+                    for item in notas:
+                        self.assertEqual(lote['nota'][item.pk_id], app.calcular_media_por_disciplina(item))
+                    medias = [app.calcular_media_por_disciplina(item) for item in notas]
+                    self.assertEqual(media, app.calcular_media_geral(medias), aluno_id)
+
+    @unittest.skipUnless(enote.np is not None, "NumPy não está instalado")
+    def test_numpy_igual_ao_python_puro(self):
+        armazem = enote.ArmazemColunar.carregar(self.app.conexao.cursor())
+        for codigo in POLITICAS:
+            with self.subTest(politica=codigo):
+                politica = enote.criar_politica_media(codigo)
+                com_numpy = armazem.calcular_medias(politica)
+                np, enote.np = enote.np, None
+                try:
+                    sem_numpy = armazem.calcular_medias(politica)
+                finally:
+                    enote.np = np
+                self.assertEqual(com_numpy, sem_numpy)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Confere que bancos do ENOTE 4.0 e 4.4 (componentes em JSON dentro de notas) passam pelas
+MIGRACOES 1-7 com as mesmas notas, pesos e médias que tinham.
+Rodar com: python -m pytest test_migracoes.py  (ou python -m unittest test_migracoes)
+"""
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from fractions import Fraction
+from io import StringIO
+
+from apoio_testes import criar_app, enote, fechar
+
+# Esquemas gravados pelo ENOTE 4.0 (chave 'id', componentes com peso) e 4.4 (chave 'pk_id', sem peso)
+ESQUEMAS = {
+    "4.0": """
+        CREATE TABLE alunos (id TEXT PRIMARY KEY, nome TEXT NOT NULL, matricula TEXT,
+                             data_nascimento TEXT, turma TEXT NOT NULL, contato TEXT);
+        CREATE TABLE notas (id INTEGER PRIMARY KEY AUTOINCREMENT, aluno_id TEXT NOT NULL,
+                            disciplina TEXT NOT NULL, componentes TEXT NOT NULL,
+                            FOREIGN KEY (aluno_id) REFERENCES alunos(id) ON DELETE CASCADE);
+    """,
+    "4.4": """
+        CREATE TABLE alunos (id TEXT PRIMARY KEY, nome TEXT NOT NULL, matricula TEXT,
+                             data_nascimento TEXT, turma TEXT NOT NULL, contato TEXT);
+        CREATE TABLE notas (pk_id INTEGER PRIMARY KEY AUTOINCREMENT, aluno_id TEXT NOT NULL,
+                            disciplina TEXT NOT NULL, componentes TEXT NOT NULL,
+                            FOREIGN KEY (aluno_id) REFERENCES alunos(id) ON DELETE CASCADE);
+        CREATE TABLE config (chave TEXT PRIMARY KEY, valor TEXT);
+    """,
+}
+ILEGIVEL = '[{"nome": "P1", "nota": 7.5'
+
+
+def criar_banco_antigo(caminho, versao):
+    """ Banco no formato da versão indicada; retorna {pk: [(nome, nota, peso)]} com as notas gravadas. """
+    conexao = sqlite3.connect(caminho)
+    conexao.executescript(ESQUEMAS[versao])
+    sorteio = random.Random(40 if versao == "4.0" else 44)
+    gravadas = {}
+    for i in range(60):
+        conexao.execute("INSERT INTO alunos VALUES (?, ?, ?, '', ?, '')", (f"A{i}", f"Aluno {i}", f"M{i}", f"T{i % 3}"))
+        for disciplina in ("MAT", "POR"):
+            comps = [{"nome": nome, "nota": sorteio.choice([0.0, 10.0, round(sorteio.uniform(0, 10), 1),
+                                                            round(sorteio.uniform(0, 10), 2)])}
+                     for nome in ("AV1", "AV2", "Trabalho")]
+            if versao == "4.0":
+                for c in comps:
+                    c["peso"] = sorteio.randint(1, 5)
+            cur = conexao.execute("INSERT INTO notas (aluno_id, disciplina, componentes) VALUES (?, ?, ?)",
+                                  (f"A{i}", disciplina, json.dumps(comps)))
+            gravadas[cur.lastrowid] = [(c["nome"], c["nota"], c.get("peso", 1)) for c in comps]
+    conexao.execute("INSERT INTO notas (aluno_id, disciplina, componentes) VALUES ('A0', 'HIS', ?)", (ILEGIVEL,))
+    conexao.commit()
+    conexao.close()
+    return gravadas
+
+
+def abrir_no_enote(caminho):
+    """ Abre o banco como o app faz ao iniciar, aplicando as migrações; retorna (app, stderr). """
+    with redirect_stderr(StringIO()) as erros:
+        app = criar_app(caminho)
+    return app, erros.getvalue()
+
+
+class TestMigracoes(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for nome in os.listdir(self.pasta):
+            os.remove(os.path.join(self.pasta, nome))
+        os.rmdir(self.pasta)
+
+    def test_bancos_antigos(self):
+        for versao in ESQUEMAS:
+            with self.subTest(versao=versao):
+                caminho = os.path.join(self.pasta, f"enote{versao}.db")
+                gravadas = criar_banco_antigo(caminho, versao)
+                app, erros = abrir_no_enote(caminho)
+                cur = app.cursor
+                cur.execute("PRAGMA user_version")
+                self.assertEqual(cur.fetchone()[0], app.VERSAO_SCHEMA)
+
+                cur.execute("SELECT nota_pk, nome, nota, peso FROM componentes ORDER BY nota_pk, ordem")
+                migradas = {}
+                for pk, nome, nota, peso in cur.fetchall():
+                    migradas.setdefault(pk, []).append((nome, nota, peso))
+                self.assertEqual(migradas, {pk: [(nome, round(nota * enote.ESCALA_NOTA), peso) for nome, nota, peso in comps]
+                                            for pk, comps in gravadas.items()})
+
+                # Médias gravadas = média simples das notas originais, arredondada em centésimos
+                cur.execute("SELECT pk_id, media FROM notas WHERE pk_id IN (%s)" % ",".join(map(str, gravadas)))
+                for pk, media in cur.fetchall():
+                    notas = [Fraction(str(nota)) * enote.ESCALA_NOTA for _, nota, _ in gravadas[pk]]
+                    self.assertEqual(media, int(sum(notas) / len(notas) + Fraction(1, 2)), pk)
+
+                # JSON ilegível: a linha continua com o texto original e é informada
+                cur.execute("SELECT pk_id, componentes FROM notas WHERE disciplina = 'HIS'")
+                pk, texto = cur.fetchone()
+                self.assertEqual(texto, ILEGIVEL)
+                self.assertIn(f"Notas {pk}", erros)
+                fechar(app)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Confere com EXPLAIN QUERY PLAN que as CONSULTAS_QUENTES do ENOTE 4.4 usam os índices
+esperados, num banco temporário criado pelas migrações do próprio app.
+Rodar com: python -m pytest test_plano_consultas.py  (ou python -m unittest test_plano_consultas)
+"""
+import os
+import tempfile
+import unittest
+
+from apoio_testes import criar_app, enote, fechar
+
+
+class TestPlanoConsultas(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.mkdtemp()
+        self.app = criar_app(os.path.join(self.pasta, "enote.db"))
+        self.conexao = self.app.conexao
+
+    def tearDown(self):
+        fechar(self.app)
+        for nome in os.listdir(self.pasta):
+            os.remove(os.path.join(self.pasta, nome))
+        os.rmdir(self.pasta)
+
+    def test_banco_vazio(self):
+        self.assertEqual(enote.verificar_plano_consultas(self.conexao.cursor()), {})
+
+    def test_banco_com_dados(self):
+        cur = self.conexao.cursor()
+        for i in range(300):
+            cur.execute("INSERT INTO alunos (id, nome, matricula, turma, media, situacao) VALUES (?, ?, ?, ?, ?, ?)",
+                        (f"A{i}", f"Aluno {i}", f"M{i}", f"T{i % 10}", i * 3 % 1001, "Aprovado"))
+            for disciplina in ("MAT", "POR", "HIS"):
+                cur.execute("INSERT INTO notas (aluno_id, disciplina, componentes, media) VALUES (?, ?, '[]', ?)",
+                            (f"A{i}", disciplina, i * 7 % 1001))
+                cur.executemany("INSERT INTO componentes (nota_pk, nome, nota, peso, ordem) VALUES (?, ?, ?, 1, ?)",
+                                [(cur.lastrowid, f"P{o}", (i + o) % 1001, o) for o in range(4)])
+        self.conexao.commit()
+        self.assertEqual(enote.verificar_plano_consultas(cur), {})
+
+
+if __name__ == "__main__":
+    unittest.main()